@@ -0,0 +1,47 @@
+"""Prints every number that differs between two benchmark result files.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+
+
+def flatten(value, prefix: str = "") -> dict:
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: value}
+    return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+    if before.get("benchmark") != after.get("benchmark"):
+        print(f"warning: comparing {before.get('benchmark')} with {after.get('benchmark')}")
+    print(f"{before.get('git_commit')} -> {after.get('git_commit')}")
+
+    old, new = flatten(before.get("results", {})), flatten(after.get("results", {}))
+    width = max((len(key) for key in old.keys() | new.keys()), default=0)
+    for key in sorted(old.keys() | new.keys()):
+        if key not in old or key not in new:
+            print(f"  {key:<{width}}  {old.get(key, '-'):>14}  {new.get(key, '-'):>14}")
+            continue
+        if old[key] == new[key]:
+            continue
+        change = f"{(new[key] - old[key]) / old[key] * 100:+.1f}%" if old[key] else ""
+        print(f"  {key:<{width}}  {old[key]:>14,.3f}  {new[key]:>14,.3f}  {change:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Machine-readable benchmark results, shared by the scripts in this directory.
+
+Each script takes --output PATH and writes one JSON document: the benchmark name, when and where it ran
+(git commit, Python, platform), its arguments and its numbers. benchmarks.compare diffs two of them.
+"""
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import List, Optional
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    # nearest-rank percentile
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def latency_summary(seconds: List[float]) -> dict:
+    return {
+        "count": len(seconds),
+        "p50_ms": _ms(percentile(seconds, 50)),
+        "p90_ms": _ms(percentile(seconds, 90)),
+        "p99_ms": _ms(percentile(seconds, 99)),
+        "max_ms": _ms(max(seconds) if seconds else None),
+    }
+
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value * 1000, 3)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path: Optional[str], name: str, args, results: dict) -> dict:
+    document = {
+        "benchmark": name,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "args": vars(args),
+        "results": results,
+    }
+    if path:
+        with open(path, "w") as file:
+            json.dump(document, file, indent=2, default=str)
+        print(f"results written to {path}")
+    return document
@@ -0,0 +1,84 @@
+"""Compares serializing a page of logs through ORM objects and pydantic against plain rows and orjson.
+
+    python -m benchmarks.serialization --rows 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.results import write_results
+from benchmarks.storage_layout import build_encoded_layout, generate_rows
+from log_center.api import LogEntryCreate
+from log_center.models import LogEntry
+from log_center.serialization import dumps, log_dicts, log_rows, orjson
+
+entries = TypeAdapter(List[LogEntryCreate])
+
+
+def orm_path(db, limit: int) -> bytes:
+    # what the list routes did before: hydrate LogEntry objects, validate each against the response model, json.dumps
+    logs = db.query(LogEntry).order_by(LogEntry.timestamp, LogEntry.id).limit(limit).all()
+    return json.dumps(entries.dump_python(entries.validate_python(logs, from_attributes=True), mode="json")).encode()
+
+
+def row_path(db, limit: int) -> bytes:
+    rows = log_rows(db).order_by(LogEntry.timestamp, LogEntry.id).limit(limit).all()
+    return dumps(log_dicts(rows))
+
+
+def measure(session_factory, path, limit: int):
+    db = session_factory()
+    try:
+        started = time.perf_counter()
+        body = path(db, limit)
+        seconds = time.perf_counter() - started
+    finally:
+        db.close()
+
+    # a second run under tracemalloc, which slows everything down too much to time the first
+    db = session_factory()
+    try:
+        tracemalloc.start()
+        path(db, limit)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        db.close()
+    return limit / seconds, peak, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--processes", type=int, default=300)
+    parser.add_argument("--dir", default=None, help="where to put the database (default: a temporary directory)")
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix="logcenter-bench-")
+    path = os.path.join(directory, "serialization.db")
+    if os.path.exists(path):
+        os.remove(path)
+    engine = build_encoded_layout(path, generate_rows(max(args.rows), args.processes))
+    session_factory = sessionmaker(bind=engine)
+
+    results = {"encoder": "orjson" if orjson is not None else "json", "rows": {}}
+    print(f"encoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}")
+    print(f"{'rows':>10}{'path':>8}{'rows/s':>14}{'peak MB':>12}{'body MB':>12}")
+    for limit in args.rows:
+        for name, serialize in (("orm", orm_path), ("rows", row_path)):
+            rate, peak, size = measure(session_factory, serialize, limit)
+            results["rows"].setdefault(str(limit), {})[name] = {"rows_per_sec": round(rate, 1), "peak_bytes": peak, "body_bytes": size}
+            print(f"{limit:>10}{name:>8}{rate:>14,.0f}{peak / 1e6:>12.1f}{size / 1e6:>12.1f}")
+    write_results(args.output, "serialization", args, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Compares the string and dictionary-encoded layouts of the logs table on SQLite.
+
+    python -m benchmarks.storage_layout --rows 500000 --processes 300
+"""
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, DateTime, Index, MetaData, String, Table, create_engine, func, insert, select
+
+from benchmarks.results import write_results
+from log_center.models import LEVEL_CODES, LogEntry, Process
+
+LEVELS = list(LEVEL_CODES)
+
+string_metadata = MetaData()
+string_logs = Table(
+    "logs", string_metadata,
+    Column("id", String, primary_key=True, index=True),
+    Column("level", String),
+    Column("message", String),
+    Column("process_name", String),
+    Column("timestamp", DateTime),
+    Index("ix_logs_timestamp_id", "timestamp", "id"),
+    Index("ix_logs_level_timestamp", "level", "timestamp", "id"),
+    Index("ix_logs_process_name_timestamp", "process_name", "timestamp", "id"),
+    Index("ix_logs_process_name_level_timestamp", "process_name", "level", "timestamp", "id"),
+)
+
+
+def generate_rows(count: int, processes: int, seed: int = 1, skew: float = 0.0):
+    # skew > 0 makes a few processes much busier than the rest, process n gets weight 1 / n ** skew
+    from log_center.ids import new_ulid
+
+    rng = random.Random(seed)
+    names = [f"service-{index:03d}.worker" for index in range(processes)]
+    weights = list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(processes))) if skew else None
+    start = datetime(2025, 1, 1)
+    for index in range(count):
+        timestamp = start + timedelta(seconds=index)
+        yield {
+            "id": new_ulid(timestamp),
+            "level": rng.choices(LEVELS, weights=[40, 40, 10, 8, 2])[0],
+            "message": f"request {index} finished in {rng.randint(1, 500)}ms",
+            "process_name": rng.choices(names, cum_weights=weights)[0] if weights else rng.choice(names),
+            "timestamp": timestamp,
+        }
+
+
+def build_string_layout(path: str, rows):
+    engine = create_engine(f"sqlite:///{path}")
+    string_metadata.create_all(engine)
+    with engine.begin() as conn:
+        for chunk in _chunks(rows):
+            conn.execute(insert(string_logs), chunk)
+    return engine
+
+
+def build_encoded_layout(path: str, rows):
+    engine = create_engine(f"sqlite:///{path}")
+    LogEntry.metadata.create_all(engine, tables=[Process.__table__, LogEntry.__table__])
+    process_ids = {}
+    with engine.begin() as conn:
+        for chunk in _chunks(rows):
+            for name in {row["process_name"] for row in chunk} - process_ids.keys():
+                process_ids[name] = conn.execute(insert(Process.__table__).values(name=name)).inserted_primary_key[0]
+            conn.execute(insert(LogEntry.__table__), [
+                {"id": row["id"], "level": row["level"], "message": row["message"],
+                 "process_id": process_ids[row["process_name"]], "timestamp": row["timestamp"]}
+                for row in chunk
+            ])
+    return engine
+
+
+def _chunks(rows, size: int = 10000):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def object_sizes(engine) -> dict:
+    # needs SQLite built with the dbstat table, which the Python builds usually are
+    with engine.connect() as conn:
+        try:
+            rows = conn.exec_driver_sql("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").all()
+        except Exception:
+            return {}
+    return {name: size for name, size in rows if name.startswith(("logs", "ix_logs", "sqlite_autoindex_logs", "processes"))}
+
+
+def timed(engine, statement, repeat: int) -> float:
+    with engine.connect() as conn:
+        conn.execute(statement).all()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(statement).all()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def queries(process_name: str):
+    since = datetime(2025, 1, 2)
+    return {
+        "process + level page": (
+            select(string_logs).where(string_logs.c.process_name == process_name, string_logs.c.level == "ERROR")
+            .order_by(string_logs.c.timestamp, string_logs.c.id).limit(1000),
+            select(LogEntry).where(LogEntry.process_name == process_name, LogEntry.level == "ERROR")
+            .order_by(LogEntry.timestamp, LogEntry.id).limit(1000),
+        ),
+        "level page": (
+            select(string_logs).where(string_logs.c.level == "WARNING", string_logs.c.timestamp >= since)
+            .order_by(string_logs.c.timestamp, string_logs.c.id).limit(1000),
+            select(LogEntry).where(LogEntry.level == "WARNING", LogEntry.timestamp >= since)
+            .order_by(LogEntry.timestamp, LogEntry.id).limit(1000),
+        ),
+        "count per process": (
+            select(string_logs.c.process_name, func.count()).group_by(string_logs.c.process_name),
+            select(LogEntry.process_id, func.count()).group_by(LogEntry.process_id),
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--processes", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--dir", default=None, help="where to put the databases (default: a temporary directory)")
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix="logcenter-bench-")
+    string_path = os.path.join(directory, "string_layout.db")
+    encoded_path = os.path.join(directory, "encoded_layout.db")
+    for path in (string_path, encoded_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    string_engine = build_string_layout(string_path, generate_rows(args.rows, args.processes))
+    encoded_engine = build_encoded_layout(encoded_path, generate_rows(args.rows, args.processes))
+
+    print(f"{args.rows} rows, {args.processes} processes")
+    print(f"{'file size':<38}{os.path.getsize(string_path) / 1e6:>10.1f} MB{os.path.getsize(encoded_path) / 1e6:>10.1f} MB")
+    string_sizes, encoded_sizes = object_sizes(string_engine), object_sizes(encoded_engine)
+    for name in sorted(set(string_sizes) | set(encoded_sizes)):
+        string_size = f"{string_sizes[name] / 1e6:.1f} MB" if name in string_sizes else "-"
+        encoded_size = f"{encoded_sizes[name] / 1e6:.1f} MB" if name in encoded_sizes else "-"
+        print(f"  {name:<36}{string_size:>13}{encoded_size:>13}")
+
+    results = {
+        "file_bytes": {"string": os.path.getsize(string_path), "encoded": os.path.getsize(encoded_path)},
+        "object_bytes": {"string": string_sizes, "encoded": encoded_sizes},
+        "query_ms": {},
+    }
+    print(f"{'query (ms)':<38}{'string':>13}{'encoded':>13}")
+    for name, (string_query, encoded_query) in queries("service-007.worker").items():
+        string_ms, encoded_ms = timed(string_engine, string_query, args.repeat), timed(encoded_engine, encoded_query, args.repeat)
+        results["query_ms"][name] = {"string": round(string_ms, 3), "encoded": round(encoded_ms, 3)}
+        print(f"  {name:<36}{string_ms:>13.2f}{encoded_ms:>13.2f}")
+    write_results(args.output, "storage_layout", args, results)
+
+
+if __name__ == "__main__":
+    main()
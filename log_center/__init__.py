@@ -5,6 +5,8 @@ load_dotenv()
 from .api import router
 from .models import LogEntry, APIKey, LogLevel, get_db, Base
 from .log_client import LogWriter
+from .log_handler import LogCenterHandler
 from .log_query import LogQuery
+from .async_log_query import AsyncLogQuery
 from .log_admin import LogAdmin
 from .create_database import create_database
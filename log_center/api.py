@@ -1,20 +1,134 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Union
 import secrets
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 
-from fastapi import APIRouter, Depends, HTTPException, Header, Request
-from pydantic import BaseModel, EmailStr
-from sqlalchemy.orm import Session
+import os
+import time
 
-from .models import LogEntry, APIKey, get_db, LogLevel, KeyHolder
+from fastapi import APIRouter, Depends, HTTPException, Header, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, EmailStr, Field, ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 
-router = APIRouter()
+from .models import LogEntry, APIKey, get_db, get_read_db, read_replicas, LogLevel, KeyHolder, SessionLocal, Process, WriterSessionLocal, SQLITE_WRITER
+from .ingest import insert_log_rows, IngestPipeline, IngestQueueFull, Durability
+from .key_cache import APIKeyCache
+from .ids import ULID_PATTERN
+from .pagination import paginate, page_query, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from .log_search import filter_logs, SearchOrder
+from .query_plans import explain, uses_index
+from .serialization import LogRowsResponse, log_rows
+from .export import stream_export, stream_ndjson, MEDIA_TYPES
+from .search import search_filter, ranked, parse_search
+from .rollups import stats_query, BUCKETS, RollupBuffer
+from .tail import TailFilter, tail_broker
+from .retention import RetentionPolicy, RetentionScheduler, LogArchive
+from .metrics import registry, TimedRoute, METRICS_ENABLED, API_KEY_CHECKS, API_KEY_LOOKUP_SECONDS
+from .wire import decode_batch, decoded_log_row, content_types, content_encodings, UnsupportedWireFormat, PayloadTooLarge
+
+router = APIRouter(route_class=TimedRoute)
+
+MAX_BATCH_SIZE = int(os.getenv("LOG_CENTER_MAX_BATCH_SIZE", 10000))
+# limit on the decoded (decompressed) batch body
+MAX_BATCH_BYTES = int(os.getenv("LOG_CENTER_MAX_BATCH_BYTES", 64 * 1024 * 1024))
+
+# the SQLite writer is the group commit thread, on its own connection
+GROUP_COMMIT = os.getenv("LOG_CENTER_GROUP_COMMIT", "false").lower() == "true" or SQLITE_WRITER
+INGEST_COMMIT_TIMEOUT = float(os.getenv("LOG_CENTER_INGEST_COMMIT_TIMEOUT", 30))
+INGEST_RETRY_AFTER = os.getenv("LOG_CENTER_INGEST_RETRY_AFTER", "1")
+
+TAIL_HEARTBEAT = float(os.getenv("LOG_CENTER_TAIL_HEARTBEAT", 15))
+
+# above 0, rollups are flushed from a background thread instead of updated in each ingest transaction;
+# counts not yet flushed are lost if the process dies
+ROLLUP_FLUSH_INTERVAL = float(os.getenv("LOG_CENTER_ROLLUP_FLUSH_INTERVAL", 0))
+rollup_buffer = RollupBuffer(WriterSessionLocal, interval=ROLLUP_FLUSH_INTERVAL) if ROLLUP_FLUSH_INTERVAL > 0 else None
+
+ingest_pipeline = IngestPipeline(
+    WriterSessionLocal,
+    max_batch=int(os.getenv("LOG_CENTER_INGEST_MAX_BATCH", 1000)),
+    linger=float(os.getenv("LOG_CENTER_INGEST_LINGER_MS", 5)) / 1000,
+    queue_size=int(os.getenv("LOG_CENTER_INGEST_QUEUE_SIZE", 10000)),
+    durability=Durability(os.getenv("LOG_CENTER_INGEST_DURABILITY", Durability.COMMIT.value)),
+    rollups=rollup_buffer,
+)
+router.add_event_handler("shutdown", ingest_pipeline.stop)
+if rollup_buffer is not None:
+    # after the pipeline, whose last batch adds to the buffer
+    router.add_event_handler("shutdown", rollup_buffer.stop)
+
+ARCHIVE_DIR = os.getenv("LOG_CENTER_ARCHIVE_DIR")
+log_archive = LogArchive(ARCHIVE_DIR) if ARCHIVE_DIR else None
+
+# runs in every worker that has LOG_CENTER_RETENTION set, so set it on one worker only
+retention_scheduler = RetentionScheduler(
+    WriterSessionLocal,
+    RetentionPolicy.parse(os.getenv("LOG_CENTER_RETENTION")),
+    archive=log_archive,
+    interval=float(os.getenv("LOG_CENTER_RETENTION_INTERVAL", 3600)),
+    batch_size=int(os.getenv("LOG_CENTER_RETENTION_BATCH_SIZE", 1000)),
+    pause=float(os.getenv("LOG_CENTER_RETENTION_PAUSE_MS", 50)) / 1000,
+)
+router.add_event_handler("startup", retention_scheduler.start)
+router.add_event_handler("shutdown", retention_scheduler.stop)
+
+api_key_cache = APIKeyCache(
+    max_size=int(os.getenv("LOG_CENTER_KEY_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("LOG_CENTER_KEY_CACHE_TTL", 60)),
+    negative_ttl=float(os.getenv("LOG_CENTER_KEY_CACHE_NEGATIVE_TTL", 5)),
+    invalidation_file=os.getenv("LOG_CENTER_KEY_CACHE_INVALIDATION_FILE"),
+)
+
+# without it /metrics needs the admin key, as x-admin-api-key or "Authorization: Bearer <key>"
+METRICS_PUBLIC = os.getenv("LOG_CENTER_METRICS_PUBLIC", "true").lower() == "true"
+
+registry.callback("log_center_ingest_queue_depth", "Rows waiting for the group-commit writer", "gauge",
+                  lambda: ingest_pipeline.stats()["queue_depth"])
+registry.callback("log_center_ingest_rows_failed_total", "Group-commit rows whose transaction failed", "counter",
+                  lambda: ingest_pipeline.stats()["rows_failed"])
+registry.callback("log_center_ingest_rejected_requests_total", "Requests turned away with 429 because the ingest queue was full", "counter",
+                  lambda: ingest_pipeline.stats()["rejected_requests"])
+registry.callback("log_center_api_key_cache_size", "Entries in the API key cache", "gauge", lambda: api_key_cache.stats()["size"])
+registry.callback("log_center_tail_subscribers", "Open /logs/tail streams", "gauge", lambda: tail_broker.stats()["subscribers"])
+registry.callback("log_center_tail_dropped_total", "Tail events dropped because a subscriber fell behind", "counter",
+                  lambda: tail_broker.stats()["dropped"])
+registry.callback("log_center_retention_deleted_total", "Logs deleted by the retention scheduler", "counter",
+                  lambda: retention_scheduler.stats()["deleted"])
+registry.callback("log_center_read_replica_healthy", "1 while a read replica is in rotation", "gauge",
+                  lambda: {(replica["url"],): int(replica["healthy"]) for replica in read_replicas.stats()["replicas"]}, ("replica",))
+registry.callback("log_center_read_primary_fallbacks_total", "Read sessions served by the primary because every replica was down", "counter",
+                  lambda: read_replicas.stats()["primary_fallbacks"])
 
 class LogEntryCreate(BaseModel):
+    id: Optional[str] = Field(None, pattern=ULID_PATTERN.pattern)
     level: LogLevel
     message: str
     process_name: str
-    timestamp: datetime = datetime.now()
+    timestamp: datetime = Field(default_factory=datetime.now)
+
+class LogBatchRejection(BaseModel):
+    index: int
+    error: str
+
+class LogBatchResponse(BaseModel):
+    accepted: int
+    rejected: int
+    errors: List[LogBatchRejection] = []
+
+class LogStats(BaseModel):
+    bucket_start: Optional[datetime] = None
+    process_name: Optional[str] = None
+    level: Optional[str] = None
+    count: int
+
+class QueryPlan(BaseModel):
+    sql: str
+    plan: List[str]
+    uses_index: Optional[bool] = None
 
 class APIKeyCreate(BaseModel):
     owner_email: EmailStr
@@ -31,9 +145,29 @@ class KeyHolderCreate(BaseModel):
 
 
 def verify_api_key(x_api_key: Optional[str] = Header(None), db: Session = Depends(get_db)):
-    if not x_api_key or not db.query(APIKey).filter(APIKey.key == x_api_key, APIKey.active == True).first():
+    if not x_api_key:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    valid = api_key_cache.get(x_api_key)
+    source = "cache"
+    if valid is None:
+        started = time.perf_counter()
+        valid = db.query(APIKey.key).filter(APIKey.key == x_api_key, APIKey.active == True).first() is not None
+        API_KEY_LOOKUP_SECONDS.observe(time.perf_counter() - started)
+        api_key_cache.set(x_api_key, valid)
+        source = "db"
+    API_KEY_CHECKS.inc(source, "valid" if valid else "invalid")
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid API key")
 
+def verify_api_key_once(x_api_key: Optional[str] = Header(None)):
+    # for long-lived streams: a get_db session would stay checked out until the stream ends
+    db = SessionLocal()
+    try:
+        verify_api_key(x_api_key, db)
+    finally:
+        db.close()
+
 
 @router.post("/users/approve")
 def approve_user(
@@ -73,7 +207,9 @@ def deactivate_user(
     
     approved_user.deactivate_user()
     
+    deactivated_keys = [api_key.key for api_key in users_keys]
     db.commit()
+    api_key_cache.invalidate(deactivated_keys)
     db.refresh(approved_user)
     return {"message": "User and all their keys deactivated", "user": approved_user}
 
@@ -101,6 +237,7 @@ def create_api_key(
     )
     db.add(api_key)
     db.commit()
+    api_key_cache.invalidate([new_key])
     db.refresh(api_key)
     return api_key
 
@@ -122,11 +259,12 @@ def deactivate_api_key(
     api_key.deactivate_key()
     
     db.commit()
+    api_key_cache.invalidate([key])
     db.refresh(api_key)
     return api_key
 
 
-@router.post("/keys/deactivate/{owner_email}", response_model=APIKeyResponse)
+@router.post("/keys/deactivate/by-owner/{owner_email}", response_model=List[APIKeyResponse])
 def deactivate_api_key_by_owner(
     owner_email: EmailStr,
     request: Request,
@@ -143,7 +281,9 @@ def deactivate_api_key_by_owner(
     for api_key in api_keys:
         api_key.deactivate_key()
         
+    deactivated_keys = [api_key.key for api_key in api_keys]
     db.commit()
+    api_key_cache.invalidate(deactivated_keys)
 
     return api_keys
 
@@ -151,7 +291,7 @@ def deactivate_api_key_by_owner(
 def get_active_api_keys_by_owner(
     owner_email: EmailStr,
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     x_admin_api_key: Optional[str] = Header(None)
 ):
     if x_admin_api_key != request.app.state.ADMIN_API_KEY:
@@ -166,7 +306,7 @@ def get_active_api_keys_by_owner(
 @router.get("/keys/active/", response_model=List[APIKeyResponse])
 def get_active_api_keys(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     x_admin_api_key: Optional[str] = Header(None)
 ):
     if x_admin_api_key != request.app.state.ADMIN_API_KEY:
@@ -180,7 +320,7 @@ def get_active_api_keys(
 @router.get("/keys/deactivated/", response_model=List[APIKeyResponse])
 def get_deactivated_api_keys(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     x_admin_api_key: Optional[str] = Header(None)
 ):
     if x_admin_api_key != request.app.state.ADMIN_API_KEY:
@@ -192,70 +332,389 @@ def get_deactivated_api_keys(
     return api_keys
 
 
+def _validation_error_text(error: ValidationError) -> str:
+    # an empty loc is the record itself, e.g. a batch item that is not an object
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" if err['loc'] else err['msg'] for err in error.errors()
+    )
+
+def _log_row(entry: LogEntryCreate) -> dict:
+    row = {"level": entry.level.value, "message": entry.message, "process_name": entry.process_name, "timestamp": entry.timestamp}
+    if entry.id:
+        row["id"] = entry.id
+    return row
+
+def _wire_format_headers() -> dict:
+    # lets clients find out which body formats and compressions they can switch to
+    return {"Accept-Post": ", ".join(content_types()), "Accept-Encoding": ", ".join(content_encodings())}
+
+async def read_log_batch(request: Request) -> list:
+    # JSON, msgpack or length-prefixed records, optionally gzip or zstd compressed; see wire.py
+    body = await request.body()
+    try:
+        entries = await run_in_threadpool(
+            decode_batch, body, request.headers.get("content-type"), request.headers.get("content-encoding"), MAX_BATCH_BYTES,
+        )
+    except UnsupportedWireFormat as e:
+        raise HTTPException(status_code=415, detail=str(e), headers=_wire_format_headers())
+    except PayloadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid request body: {e}")
+    if len(entries) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds the maximum of {MAX_BATCH_SIZE} records")
+    return entries
+
+def _batch_rows(entries: list):
+    # well-formed records skip pydantic entirely; the rest are validated one by one for the exact error
+    rows = []
+    errors = []
+    for index, raw in enumerate(entries):
+        row = decoded_log_row(raw)
+        if row is not None:
+            rows.append(row)
+            continue
+        try:
+            rows.append(_log_row(LogEntryCreate.model_validate(raw)))
+        except ValidationError as e:
+            errors.append(LogBatchRejection(index=index, error=_validation_error_text(e)))
+    return rows, errors
+
+BATCH_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/LogEntryCreate"}}},
+            "application/x-msgpack": {"schema": {"type": "string", "format": "binary"}},
+            "application/x-log-center-records": {"schema": {"type": "string", "format": "binary"}},
+        },
+    },
+}
+
+
+@router.get("/keys/cache/stats")
+def get_api_key_cache_stats(
+    request: Request,
+    x_admin_api_key: Optional[str] = Header(None)
+):
+    if x_admin_api_key != request.app.state.ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized: Invalid admin key")
+    
+    return api_key_cache.stats()
+
+
+@router.get("/ingest/stats")
+def get_ingest_stats(
+    request: Request,
+    x_admin_api_key: Optional[str] = Header(None)
+):
+    if x_admin_api_key != request.app.state.ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized: Invalid admin key")
+    
+    return {"group_commit": GROUP_COMMIT, **ingest_pipeline.stats(), "rollups": rollup_buffer.stats() if rollup_buffer else None}
+
+
+@router.get("/tail/stats")
+def get_tail_stats(
+    request: Request,
+    x_admin_api_key: Optional[str] = Header(None)
+):
+    if x_admin_api_key != request.app.state.ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized: Invalid admin key")
+    
+    return tail_broker.stats()
+
+
+@router.get("/replicas/stats")
+def get_replica_stats(
+    request: Request,
+    x_admin_api_key: Optional[str] = Header(None)
+):
+    if x_admin_api_key != request.app.state.ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized: Invalid admin key")
+    
+    return read_replicas.stats()
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics(
+    request: Request,
+    x_admin_api_key: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None)
+):
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    admin_key = request.app.state.ADMIN_API_KEY
+    if not METRICS_PUBLIC and x_admin_api_key != admin_key and authorization != f"Bearer {admin_key}":
+        raise HTTPException(status_code=403, detail="Unauthorized: Invalid admin key")
+    
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/retention/stats")
+def get_retention_stats(
+    request: Request,
+    x_admin_api_key: Optional[str] = Header(None)
+):
+    if x_admin_api_key != request.app.state.ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized: Invalid admin key")
+    
+    return retention_scheduler.stats()
+
+
 @router.post("/logs/")
 def post_log(entry: LogEntryCreate, db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
-    log = LogEntry(level=entry.level, message=entry.message, process_name=entry.process_name, timestamp=entry.timestamp)
-    db.add(log)
-    db.commit()
-    db.refresh(log)
-    return {"message": "Log saved", "log": log}
+    row = _log_row(entry)
+    _save_rows(db, [row])
+    queued = GROUP_COMMIT and ingest_pipeline.durability == Durability.ENQUEUE
+    return {"message": "Log queued" if queued else "Log saved", "log": row}
+
+def _save_rows(db: Session, rows: List[dict]):
+    if not GROUP_COMMIT:
+        insert_log_rows(db, rows, rollup_buffer)
+        return
+    
+    try:
+        future = ingest_pipeline.submit(rows)
+    except IngestQueueFull:
+        raise HTTPException(status_code=429, detail="Ingest queue is full, retry later", headers={"Retry-After": INGEST_RETRY_AFTER})
+    if ingest_pipeline.durability == Durability.ENQUEUE:
+        return
+    try:
+        future.result(timeout=INGEST_COMMIT_TIMEOUT)
+    except FuturesTimeoutError:
+        raise HTTPException(status_code=503, detail="Timed out waiting for the log to be committed")
+
+@router.post("/logs/batch", response_model=LogBatchResponse, openapi_extra=BATCH_REQUEST_BODY)
+def post_log_batch(response: Response, api_key: str = Depends(verify_api_key), entries: list = Depends(read_log_batch),
+                   db: Session = Depends(get_db)):
+    rows, errors = _batch_rows(entries)
+    if rows:
+        _save_rows(db, rows)
+    response.headers.update(_wire_format_headers())
+    return LogBatchResponse(accepted=len(rows), rejected=len(errors), errors=errors)
+
+def _page(query, response: Response, limit: Optional[int], cursor: Optional[str], descending: bool = False):
+    try:
+        logs, next_cursor = paginate(query, limit or DEFAULT_PAGE_SIZE, cursor, descending)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return logs
+
+def _search_page(query, db: Session, keyword: str, response: Response, limit: Optional[int], cursor: Optional[str], rank: bool):
+    # ranked results come back as a single page, keyset cursors only apply to time ordering
+    try:
+        if rank:
+            return ranked(query, db, keyword).limit(limit or DEFAULT_PAGE_SIZE).all()
+        return _page(query.filter(search_filter(db, keyword)), response, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
 @router.get("/logs/", response_model=List[LogEntryCreate])
-def get_logs(db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
-    return db.query(LogEntry).all()
+def get_logs(response: Response, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+             db: Session = Depends(get_read_db), api_key: str = Depends(verify_api_key)):
+    return LogRowsResponse(_page(log_rows(db), response, limit, cursor), response)
 
 @router.get("/logs/level/{level}", response_model=List[LogEntryCreate])
-def get_logs_by_level(level: str, db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
-    filtered_logs = db.query(LogEntry).filter(LogEntry.level == level).all()
-    if not filtered_logs:
+def get_logs_by_level(level: str, response: Response, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                      db: Session = Depends(get_read_db), api_key: str = Depends(verify_api_key)):
+    filtered_logs = _page(log_rows(db).filter(LogEntry.level == level), response, limit, cursor)
+    if not filtered_logs and not cursor:
         raise HTTPException(status_code=404, detail="No logs found for this level")
-    return filtered_logs
+    return LogRowsResponse(filtered_logs, response)
 
 @router.get("/logs/process/{process_name}", response_model=List[LogEntryCreate])
-def get_logs_by_process_name(process_name: str, db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
-    filtered_logs = db.query(LogEntry).filter(LogEntry.process_name == process_name).all()
-    if not filtered_logs:
+def get_logs_by_process_name(process_name: str, response: Response, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                             db: Session = Depends(get_read_db), api_key: str = Depends(verify_api_key)):
+    filtered_logs = _page(log_rows(db).filter(LogEntry.process_name == process_name), response, limit, cursor)
+    if not filtered_logs and not cursor:
         raise HTTPException(status_code=404, detail="No logs found for this process name")
-    return filtered_logs
-
-@router.get("/logs/filter/{process_name}/{level}", response_model=List[LogEntryCreate])
-def get_logs_by_process_and_level(process_name: str, level: str, db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
-    filtered_logs = db.query(LogEntry).filter(LogEntry.process_name == process_name, LogEntry.level == level).all()
-    if not filtered_logs:
-        raise HTTPException(status_code=404, detail="No logs found for this process name and level")
-    return filtered_logs
+    return LogRowsResponse(filtered_logs, response)
 
 @router.get("/logs/filter/messages/{keyword}", response_model=List[LogEntryCreate])
-def get_logs_by_process_and_msg_keyword(keyword: str, db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
-    filtered_logs = db.query(LogEntry).filter(LogEntry.message.contains(keyword)).all()
-    if not filtered_logs:
-        raise HTTPException(status_code=404, detail="No logs found for this process name and keyword")
-    return filtered_logs
+def get_logs_by_msg_keyword(keyword: str, response: Response, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                            rank: bool = False, db: Session = Depends(get_read_db), api_key: str = Depends(verify_api_key)):
+    filtered_logs = _search_page(log_rows(db), db, keyword, response, limit, cursor, rank)
+    if not filtered_logs and not cursor:
+        raise HTTPException(status_code=404, detail="No logs found for this keyword")
+    return LogRowsResponse(filtered_logs, response)
 
 @router.get("/logs/filter/{process_name}/messages/{keyword}", response_model=List[LogEntryCreate])
-def get_logs_by_process_and_msg_keyword(process_name: str, keyword: str, db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
-    filtered_logs = db.query(LogEntry).filter(LogEntry.process_name == process_name, LogEntry.message.contains(keyword)).all()
-    if not filtered_logs:
+def get_logs_by_process_and_msg_keyword(process_name: str, keyword: str, response: Response, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                                        rank: bool = False, db: Session = Depends(get_read_db), api_key: str = Depends(verify_api_key)):
+    filtered_logs = _search_page(log_rows(db).filter(LogEntry.process_name == process_name), db, keyword, response, limit, cursor, rank)
+    if not filtered_logs and not cursor:
         raise HTTPException(status_code=404, detail="No logs found for this process name and keyword")
-    return filtered_logs
+    return LogRowsResponse(filtered_logs, response)
+
+@router.get("/logs/filter/{process_name}/{level}", response_model=List[LogEntryCreate])
+def get_logs_by_process_and_level(process_name: str, level: str, response: Response, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                                  db: Session = Depends(get_read_db), api_key: str = Depends(verify_api_key)):
+    filtered_logs = _page(log_rows(db).filter(LogEntry.process_name == process_name, LogEntry.level == level), response, limit, cursor)
+    if not filtered_logs and not cursor:
+        raise HTTPException(status_code=404, detail="No logs found for this process name and level")
+    return LogRowsResponse(filtered_logs, response)
 
 @router.get("/logs/recent/{limit}", response_model=List[LogEntryCreate])
-def get_recent_logs(limit: int, db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
-    recent_logs = db.query(LogEntry).order_by(LogEntry.timestamp.desc()).limit(limit).all()
-    if not recent_logs:
+def get_recent_logs(response: Response, limit: int = Path(..., ge=1), cursor: Optional[str] = None, db: Session = Depends(get_read_db), api_key: str = Depends(verify_api_key)):
+    recent_logs = _page(log_rows(db), response, min(limit, MAX_PAGE_SIZE), cursor, descending=True)
+    if not recent_logs and not cursor:
         raise HTTPException(status_code=404, detail="No recent logs found")
-    return recent_logs
+    return LogRowsResponse(recent_logs, response)
 
 @router.get("/logs/date/{date}", response_model=List[LogEntryCreate])
-def get_logs_by_date(date: str, db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
-    filtered_logs = db.query(LogEntry).filter(LogEntry.timestamp >= date).all()
-    if not filtered_logs:
+def get_logs_by_date(date: str, response: Response, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                     db: Session = Depends(get_read_db), api_key: str = Depends(verify_api_key)):
+    filtered_logs = _page(log_rows(db).filter(LogEntry.timestamp >= date), response, limit, cursor)
+    if not filtered_logs and not cursor:
         raise HTTPException(status_code=404, detail="No logs found for this date")
-    return filtered_logs
+    return LogRowsResponse(filtered_logs, response)
 
 @router.get("/logs/filter/date-range/{start_date}/{end_date}", response_model=List[LogEntryCreate])
-def get_logs_by_date_range(start_date: str, end_date: str, db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
-    filtered_logs = db.query(LogEntry).filter(LogEntry.timestamp >= start_date, LogEntry.timestamp <= end_date).all()
-    if not filtered_logs:
+def get_logs_by_date_range(start_date: str, end_date: str, response: Response, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                           db: Session = Depends(get_read_db), api_key: str = Depends(verify_api_key)):
+    filtered_logs = _page(log_rows(db).filter(LogEntry.timestamp >= start_date, LogEntry.timestamp <= end_date), response, limit, cursor)
+    if not filtered_logs and not cursor:
         raise HTTPException(status_code=404, detail="No logs found for this date range")
-    return filtered_logs
\ No newline at end of file
+    return LogRowsResponse(filtered_logs, response)
+
+@router.get("/logs/search", response_model=Union[List[LogEntryCreate], QueryPlan])
+def search_logs(
+    response: Response,
+    level: List[LogLevel] = Query([]),
+    process_name: List[str] = Query([]),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    keyword: Optional[str] = None,
+    order: SearchOrder = SearchOrder.ASC,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    explain_plan: bool = Query(False, alias="explain"),
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(verify_api_key)
+):
+    # any combination of filters compiled into one statement; explain=true returns its plan instead of running it
+    if order == SearchOrder.RELEVANCE and not keyword:
+        raise HTTPException(status_code=400, detail="order=relevance requires a keyword")
+    levels = [value.value for value in level]
+    try:
+        if order == SearchOrder.RELEVANCE:
+            query = ranked(filter_logs(log_rows(db), db, levels, process_name, start_date, end_date), db, keyword)
+            query = query.limit(limit or DEFAULT_PAGE_SIZE)
+        else:
+            query = filter_logs(log_rows(db), db, levels, process_name, start_date, end_date, keyword)
+            if not explain_plan:
+                return LogRowsResponse(_page(query, response, limit, cursor, descending=order == SearchOrder.DESC), response)
+            query = page_query(query, limit or DEFAULT_PAGE_SIZE, cursor, descending=order == SearchOrder.DESC)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not explain_plan:
+        return LogRowsResponse(query.all())
+    engine = db.get_bind()
+    statement = query.statement
+    plan = explain(engine, statement, force_index=False)
+    try:
+        index_used = uses_index(engine, plan)
+    except ValueError:
+        index_used = None
+    sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    return QueryPlan(sql=sql, plan=plan, uses_index=index_used)
+
+@router.get("/logs/stats", response_model=List[LogStats], response_model_exclude_none=True)
+def get_log_stats(
+    bucket: Optional[str] = Query(None, pattern=f"^({'|'.join(BUCKETS)})$"),
+    group_by: List[str] = Query([]),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    process_name: Optional[str] = None,
+    level: Optional[LogLevel] = None,
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(verify_api_key)
+):
+    try:
+        statement = stats_query(bucket, group_by, start_date, end_date, process_name, level.value if level else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return [dict(row._mapping) for row in db.execute(statement)]
+
+@router.get("/logs/tail")
+async def tail_logs(
+    process_name: Optional[str] = None,
+    level: Optional[LogLevel] = None,
+    keyword: Optional[str] = None,
+    api_key: str = Depends(verify_api_key_once)
+):
+    # server-sent events for every log committed by this worker from now on, no database reads involved
+    try:
+        tail_filter = TailFilter(process_name, level.value if level else None, keyword)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    subscription = tail_broker.subscribe(tail_filter)
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many live tail subscribers", headers={"Retry-After": INGEST_RETRY_AFTER})
+    
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(subscription.events(TAIL_HEARTBEAT), media_type="text/event-stream", headers=headers,
+                             background=BackgroundTask(subscription.close))
+
+@router.get("/logs/archive")
+def get_archived_logs(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    level: Optional[LogLevel] = None,
+    process_name: Optional[str] = None,
+    keyword: Optional[str] = None,
+    api_key: str = Depends(verify_api_key_once)
+):
+    # streams rows the retention purge moved to the archive, as NDJSON
+    if log_archive is None:
+        raise HTTPException(status_code=404, detail="Log archiving is not enabled")
+    try:
+        terms = parse_search(keyword) if keyword else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = log_archive.read(start_date, end_date, level.value if level else None, process_name, terms)
+    return StreamingResponse(stream_ndjson(rows), media_type=MEDIA_TYPES["ndjson"])
+
+@router.get("/logs/export")
+def export_logs(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    level: Optional[LogLevel] = None,
+    process_name: Optional[str] = None,
+    keyword: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    gzip: Optional[bool] = None,
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(verify_api_key)
+):
+    statement = (
+        select(LogEntry.timestamp, LogEntry.level, Process.name.label("process_name"), LogEntry.message)
+        .outerjoin(Process, Process.id == LogEntry.process_id)
+    )
+    if level:
+        statement = statement.where(LogEntry.level == level.value)
+    if process_name:
+        statement = statement.where(LogEntry.process_name == process_name)
+    if keyword:
+        try:
+            statement = statement.where(search_filter(db, keyword))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if start_date:
+        statement = statement.where(LogEntry.timestamp >= start_date)
+    if end_date:
+        statement = statement.where(LogEntry.timestamp <= end_date)
+    statement = statement.order_by(LogEntry.timestamp, LogEntry.id)
+
+    if gzip is None:
+        gzip = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {"Content-Disposition": f"attachment; filename=logs.{format}"}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(stream_export(statement, format, gzip, bind=db.get_bind()), media_type=MEDIA_TYPES[format], headers=headers)
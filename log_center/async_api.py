@@ -0,0 +1,71 @@
+import asyncio
+import time
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .api import (
+    LogEntryCreate, LogBatchResponse, _log_row, _batch_rows, _wire_format_headers, read_log_batch, api_key_cache,
+    ingest_pipeline, rollup_buffer, GROUP_COMMIT, INGEST_COMMIT_TIMEOUT, INGEST_RETRY_AFTER, BATCH_REQUEST_BODY,
+)
+from .ingest import insert_log_rows, IngestQueueFull, Durability
+from .metrics import TimedRoute, API_KEY_CHECKS, API_KEY_LOOKUP_SECONDS
+from .models import APIKey, get_async_db
+
+# async versions of the ingest routes, mounted ahead of the sync router when LOG_CENTER_DATABASE_URL uses an async driver
+async_router = APIRouter(route_class=TimedRoute)
+
+
+async def verify_api_key_async(x_api_key: Optional[str] = Header(None), db: AsyncSession = Depends(get_async_db)):
+    if not x_api_key:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+    valid = api_key_cache.get(x_api_key)
+    source = "cache"
+    if valid is None:
+        started = time.perf_counter()
+        result = await db.execute(select(APIKey.key).where(APIKey.key == x_api_key, APIKey.active == True))
+        valid = result.first() is not None
+        API_KEY_LOOKUP_SECONDS.observe(time.perf_counter() - started)
+        api_key_cache.set(x_api_key, valid)
+        source = "db"
+    API_KEY_CHECKS.inc(source, "valid" if valid else "invalid")
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+
+async def _save_rows(db: AsyncSession, rows: List[dict]):
+    if not GROUP_COMMIT:
+        await db.run_sync(insert_log_rows, rows, rollup_buffer)
+        return
+
+    try:
+        future = ingest_pipeline.submit(rows)
+    except IngestQueueFull:
+        raise HTTPException(status_code=429, detail="Ingest queue is full, retry later", headers={"Retry-After": INGEST_RETRY_AFTER})
+    if ingest_pipeline.durability == Durability.ENQUEUE:
+        return
+    try:
+        await asyncio.wait_for(asyncio.wrap_future(future), INGEST_COMMIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Timed out waiting for the log to be committed")
+
+
+@async_router.post("/logs/")
+async def post_log_async(entry: LogEntryCreate, db: AsyncSession = Depends(get_async_db), api_key: str = Depends(verify_api_key_async)):
+    row = _log_row(entry)
+    await _save_rows(db, [row])
+    queued = GROUP_COMMIT and ingest_pipeline.durability == Durability.ENQUEUE
+    return {"message": "Log queued" if queued else "Log saved", "log": row}
+
+
+@async_router.post("/logs/batch", response_model=LogBatchResponse, openapi_extra=BATCH_REQUEST_BODY)
+async def post_log_batch_async(response: Response, api_key: str = Depends(verify_api_key_async), entries: list = Depends(read_log_batch),
+                               db: AsyncSession = Depends(get_async_db)):
+    rows, errors = _batch_rows(entries)
+    if rows:
+        await _save_rows(db, rows)
+    response.headers.update(_wire_format_headers())
+    return LogBatchResponse(accepted=len(rows), rejected=len(errors), errors=errors)
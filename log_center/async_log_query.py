@@ -0,0 +1,117 @@
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from .log_query import range_params, should_retry, time_shards
+from .models import LogLevel
+from .transport import CONNECT_TIMEOUT, POOL_SIZE, READ_TIMEOUT, backoff_delay
+
+# end-of-shard marker on the per-shard page buffers
+_DONE = object()
+
+
+class AsyncLogQuery:
+    # asyncio counterpart of LogQuery for large pulls; one httpx.AsyncClient whose pool is shared by every shard
+    def __init__(self, api_url: str, api_key: str, pool_size: int = POOL_SIZE, connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT, client: "httpx.AsyncClient" = None):
+        if httpx is None:
+            raise RuntimeError("AsyncLogQuery requires httpx, pip install httpx")
+        self.api_url = api_url.rstrip('/')
+        self.headers = {
+            "x-api-key": api_key,
+            "Content-Type": "application/json"
+        }
+        self._owns_client = client is None
+        self.client = client or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._owns_client:
+            await self.client.aclose()
+
+    async def iter_logs(self, endpoint: str = "/logs/", page_size: int = 1000, max_retries: int = 3,
+                        retry_delay: float = 0.5) -> AsyncIterator[dict]:
+        url = f"{self.api_url}/{endpoint.lstrip('/')}"
+        cursor = None
+        while True:
+            logs, cursor = await self._fetch_page(url, {"limit": page_size, "cursor": cursor}, max_retries, retry_delay)
+            for log in logs:
+                yield log
+            if not cursor:
+                return
+
+    async def fetch_range(self, start: Union[str, datetime], end: Union[str, datetime], level: Union[LogLevel, List[LogLevel], None] = None,
+                          process_name: Union[str, List[str], None] = None, keyword: Optional[str] = None, shards: int = 8,
+                          concurrency: int = 4, page_size: int = 1000, newest_first: bool = False, max_retries: int = 3,
+                          retry_delay: float = 0.5, prefetch_pages: int = 2) -> AsyncIterator[dict]:
+        # same contract as LogQuery.fetch_range; closing the iterator or cancelling the consumer cancels every shard task
+        url = f"{self.api_url}/logs/search"
+        params = range_params(level, process_name, keyword, page_size, newest_first)
+        ranges = time_shards(start, end, shards)
+        if newest_first:
+            ranges.reverse()
+        slots = asyncio.Semaphore(max(1, concurrency))
+        buffers = [asyncio.Queue(maxsize=max(1, prefetch_pages)) for _ in ranges]
+
+        async def fetch_shard(buffer: asyncio.Queue, lower: datetime, upper: datetime):
+            shard_params = {**params, "start_date": lower.isoformat(), "end_date": upper.isoformat()}
+            cursor = None
+            # waiters on a semaphore are woken in order, so the earliest shards are fetched first
+            async with slots:
+                try:
+                    while True:
+                        logs, cursor = await self._fetch_page(url, {**shard_params, "cursor": cursor}, max_retries, retry_delay)
+                        await buffer.put(logs)
+                        if not cursor:
+                            break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    await buffer.put(e)
+                    return
+            await buffer.put(_DONE)
+
+        tasks = [asyncio.create_task(fetch_shard(buffer, lower, upper)) for buffer, (lower, upper) in zip(buffers, ranges)]
+        try:
+            for buffer in buffers:
+                while True:
+                    item = await buffer.get()
+                    if item is _DONE:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    for log in item:
+                        yield log
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _fetch_page(self, url: str, params: dict, max_retries: int, retry_delay: float) -> Tuple[List[dict], Optional[str]]:
+        # requests skips None values, httpx would send them as empty strings
+        params = {key: value for key, value in params.items() if value is not None}
+        for attempt in range(max_retries):
+            try:
+                response = await self.client.get(url, headers=self.headers, params=params)
+                if not should_retry(response.status_code) or attempt + 1 == max_retries:
+                    response.raise_for_status()
+                    return response.json(), response.headers.get("X-Next-Cursor")
+            except httpx.TransportError:
+                if attempt + 1 == max_retries:
+                    raise
+                response = None
+            await asyncio.sleep(backoff_delay(attempt, retry_delay, 30.0, response))
+        return [], None
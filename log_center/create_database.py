@@ -1,10 +1,15 @@
+from datetime import datetime
+
 from sqlalchemy.engine.url import make_url
 from sqlalchemy.exc import OperationalError
-from sqlalchemy import inspect
+from sqlalchemy import inspect, Index, MetaData, Table, bindparam, case, func, insert, select, update
 import psycopg2
 import pymysql
 import pyodbc
 
+from .search import ensure_search_index, search_backend, TOKENS
+from .rollups import rebuild_rollups
+
 def create_database(database_url: str):
     url = make_url(database_url)
     db_name = url.database
@@ -21,7 +26,7 @@ def create_database(database_url: str):
     else:
         raise ValueError("Unsupported database dialect")
     
-    from .models import Base, engine
+    from .models import Base, LogRollup, engine
 
     inspector = inspect(engine)
     tables_needed = Base.metadata.tables.keys()
@@ -29,6 +34,94 @@ def create_database(database_url: str):
 
     if not all(table in existing_tables for table in tables_needed):
         Base.metadata.create_all(bind=engine)
+    
+    migrate_log_layout(engine)
+    ensure_indexes(engine)
+    ensure_search_index(engine)
+    # databases created before rollups existed get them computed from their logs once
+    if LogRollup.__tablename__ not in existing_tables:
+        rebuild_rollups(engine)
+
+# indexes created by earlier releases that are now covered by the composite indexes or the primary key on LogEntry
+OBSOLETE_INDEXES = {"logs": ["ix_logs_level", "ix_logs_process_name", "ix_logs_id"]}
+
+def ensure_indexes(engine):
+    # create_all skips tables that already exist, so indexes added to the models later are created here
+    from .models import Base
+
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+        for name in OBSOLETE_INDEXES.get(table.name, []):
+            if name in existing:
+                Index(name, table.c.id).drop(bind=engine)
+
+def migrate_log_layout(engine) -> int:
+    # rewrites a logs table from earlier releases, with process_name and level stored as strings,
+    # into the dictionary-encoded layout; indexes and the search index are rebuilt by the steps after it
+    from .models import LEVEL_CODES, LogEntry, Process
+
+    if "process_name" not in {column["name"] for column in inspect(engine).get_columns("logs")}:
+        return 0
+
+    metadata = MetaData()
+    old = Table("logs", metadata, autoload_with=engine)
+    processes = Process.__table__.to_metadata(metadata)
+    new = LogEntry.__table__.to_metadata(metadata, name="logs_migrating")
+    # the old table still owns the index names
+    new.indexes.clear()
+
+    with engine.begin() as conn:
+        conn.execute(insert(processes).from_select(
+            ["name"],
+            select(old.c.process_name).distinct()
+            .where(old.c.process_name.is_not(None), old.c.process_name.not_in(select(processes.c.name))),
+        ))
+        new.create(conn)
+        level_code = case(LEVEL_CODES, value=func.upper(old.c.level))
+        copied = conn.execute(insert(new).from_select(
+            ["id", "level", "message", "process_id", "timestamp"],
+            select(old.c.id, level_code, old.c.message, processes.c.id, old.c.timestamp)
+            .select_from(old.outerjoin(processes, processes.c.name == old.c.process_name)),
+        )).rowcount
+        old.drop(conn)
+        if engine.dialect.name == "mssql":
+            conn.exec_driver_sql("EXEC sp_rename 'logs_migrating', 'logs'")
+        else:
+            conn.exec_driver_sql("ALTER TABLE logs_migrating RENAME TO logs")
+        if engine.dialect.name == "sqlite" and inspect(conn).has_table("logs_fts"):
+            # rowids changed with the copy
+            conn.exec_driver_sql("INSERT INTO logs_fts(logs_fts) VALUES ('rebuild')")
+    return copied
+
+def backfill_log_ids(engine, batch_size: int = 5000) -> int:
+    # rewrites ids that are not ULIDs to ULIDs derived from each row's timestamp, so old rows keep their order
+    from .ids import new_ulid
+    from .models import LogEntry, LogToken
+
+    table = LogEntry.__table__
+    update_logs = update(table).where(table.c.id == bindparam("old_id")).values(id=bindparam("new_id"))
+    update_tokens = update(LogToken.__table__).where(LogToken.log_id == bindparam("old_id")).values(log_id=bindparam("new_id"))
+    update_tokens_needed = search_backend(engine) == TOKENS
+
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.timestamp).where(func.length(table.c.id) != 26).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            params = [{"old_id": row.id, "new_id": new_ulid(row.timestamp or datetime.now())} for row in rows]
+            conn.execute(update_logs, params)
+            if update_tokens_needed:
+                conn.execute(update_tokens, params)
+        total += len(rows)
+
+    return total
 
 def _create_postgres_db(url, db_name):
     conn = psycopg2.connect(
@@ -72,16 +165,61 @@ def _create_sqlserver_db(url, db_name):
     cursor.close()
     conn.close()
 
-if __name__ == "__main__":
+def main():
+    import argparse
     import os
     from dotenv import load_dotenv
     load_dotenv()
 
-    db_url = os.getenv("LOG_CENTER_DB_URL")
+    parser = argparse.ArgumentParser(description="Create or upgrade the Log Center database.")
+    parser.add_argument("--check-plans", action="store_true", help="print the query plan of every log query endpoint")
+    parser.add_argument("--backfill-ids", action="store_true", help="rewrite existing log ids as time-ordered ULIDs")
+    parser.add_argument("--rebuild-rollups", action="store_true", help="recompute the /logs/stats rollups from the logs table")
+    parser.add_argument("--purge", action="store_true", help="delete (and archive) logs past LOG_CENTER_RETENTION once")
+    args = parser.parse_args()
+
+    db_url = os.getenv("LOG_CENTER_DATABASE_URL", os.getenv("LOG_CENTER_DB_URL"))
     try:
         create_database(db_url)
         print("Database created successfully (or already exists).")
     except OperationalError as e:
         print("Error creating database:", e)
+        return
     except Exception as e:
         print("Unexpected error:", e)
+        return
+    
+    if args.backfill_ids:
+        from .models import engine
+
+        print(f"Rewrote {backfill_log_ids(engine)} log ids as ULIDs.")
+    
+    if args.rebuild_rollups:
+        from .models import engine
+
+        print(f"Rebuilt {rebuild_rollups(engine)} rollup rows.")
+    
+    if args.purge:
+        from .models import SessionLocal
+        from .retention import RetentionPolicy, RetentionScheduler, LogArchive
+
+        policy = RetentionPolicy.parse(os.getenv("LOG_CENTER_RETENTION"))
+        if not policy:
+            print("LOG_CENTER_RETENTION is not set, nothing to purge.")
+        else:
+            archive_dir = os.getenv("LOG_CENTER_ARCHIVE_DIR")
+            scheduler = RetentionScheduler(SessionLocal, policy, archive=LogArchive(archive_dir) if archive_dir else None,
+                                           batch_size=int(os.getenv("LOG_CENTER_RETENTION_BATCH_SIZE", 1000)))
+            print(f"Purged {scheduler.purge()} expired logs.")
+    
+    if args.check_plans:
+        from .models import engine
+        from .query_plans import check_query_plans
+
+        for endpoint, result in check_query_plans(engine).items():
+            print(f"{'OK  ' if result['uses_index'] else 'SCAN'} {endpoint}")
+            for line in result["plan"]:
+                print(f"     {line}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import threading
+from typing import Dict, Iterable
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+
+from .models import Process, insert_ignoring_duplicates
+
+
+class ProcessIdCache:
+    # process name -> processes.id, per engine; names are only ever added, so entries never go stale
+    def __init__(self):
+        self._ids: Dict[Engine, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def ids(self, engine: Engine, names: Iterable[str]) -> Dict[str, int]:
+        names = {name for name in names if name is not None}
+        with self._lock:
+            cached = self._ids.setdefault(engine, {})
+            missing = names - cached.keys()
+        if missing:
+            resolved = self._resolve(engine, missing)
+            with self._lock:
+                cached.update(resolved)
+        return {name: cached[name] for name in names}
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+    def _resolve(self, engine: Engine, names: set) -> Dict[str, int]:
+        # new names are committed on their own connection, so a rolled back ingest cannot leave a cached id
+        # pointing at a row that was never written; concurrent writers adding the same name both end up reading it back
+        with engine.begin() as conn:
+            found = dict(conn.execute(select(Process.name, Process.id).where(Process.name.in_(names))).all())
+            new = names - found.keys()
+            if new:
+                conn.execute(insert_ignoring_duplicates(conn, Process), [{"name": name} for name in sorted(new)])
+                found.update(conn.execute(select(Process.name, Process.id).where(Process.name.in_(new))).all())
+        return found
+
+
+process_ids = ProcessIdCache()
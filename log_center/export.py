@@ -0,0 +1,71 @@
+import csv
+import io
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import Select
+from sqlalchemy.engine import Engine
+
+from .models import SessionLocal
+from .metrics import ROWS_RETURNED
+from .serialization import dumps
+
+EXPORT_COLUMNS = ["timestamp", "level", "process_name", "message"]
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _ndjson_chunk(rows) -> bytes:
+    return b"".join(
+        dumps({"timestamp": row.timestamp, "level": row.level, "process_name": row.process_name, "message": row.message}) + b"\n"
+        for row in rows
+    )
+
+
+def _csv_chunk(rows, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows((row.timestamp.isoformat(), row.level, row.process_name, row.message) for row in rows)
+    return buffer.getvalue()
+
+
+def stream_export(statement: Select, fmt: str = "ndjson", compress: bool = False, chunk_size: int = 5000,
+                  bind: Optional[Engine] = None) -> Iterator[bytes]:
+    # the session is opened here rather than through get_db because the dependency
+    # is already closed by the time the response body is being streamed; bind keeps it on the replica the route picked
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    db = SessionLocal(bind=bind) if bind is not None else SessionLocal()
+    try:
+        if fmt == "csv":
+            header = _csv_chunk([], header=True).encode()
+            yield compressor.compress(header) if compressor else header
+
+        result = db.execute(statement.execution_options(yield_per=chunk_size))
+        for rows in result.partitions():
+            ROWS_RETURNED.inc("export", amount=len(rows))
+            data = _csv_chunk(rows).encode() if fmt == "csv" else _ndjson_chunk(rows)
+            if compressor:
+                data = compressor.compress(data)
+                if not data:
+                    continue
+            yield data
+
+        if compressor:
+            yield compressor.flush()
+    finally:
+        db.close()
+
+
+def stream_ndjson(rows: Iterable[dict], chunk_size: int = 5000) -> Iterator[bytes]:
+    chunk = []
+    for row in rows:
+        chunk.append(dumps(row) + b"\n")
+        if len(chunk) >= chunk_size:
+            yield b"".join(chunk)
+            chunk = []
+    if chunk:
+        yield b"".join(chunk)
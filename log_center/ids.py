@@ -0,0 +1,75 @@
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+# ULIDs: 48-bit millisecond timestamp + 80 random bits, Crockford base32 encoded to 26 characters.
+# They sort lexicographically in creation order, so new rows land on the right edge of the primary key index.
+CROCKFORD_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ULID_PATTERN = re.compile(r"^[0-7][0-9A-HJKMNP-TV-Z]{25}$")
+RANDOM_BITS = 80
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        chars.append(CROCKFORD_ALPHABET[value & 0x1F])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def _decode(value: str) -> int:
+    result = 0
+    for char in value:
+        result = (result << 5) | CROCKFORD_ALPHABET.index(char)
+    return result
+
+
+class ULIDGenerator:
+    # monotonic within a process: ids created in the same millisecond increment the random part instead of redrawing it
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def new(self, timestamp: Optional[datetime] = None) -> str:
+        if timestamp is not None:
+            return self._format(_to_ms(timestamp), int.from_bytes(os.urandom(10), "big"))
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms <= self._last_ms:
+                now_ms = self._last_ms
+                self._last_random = (self._last_random + 1) & ((1 << RANDOM_BITS) - 1)
+                if self._last_random == 0:
+                    now_ms += 1
+            else:
+                self._last_random = int.from_bytes(os.urandom(10), "big")
+            self._last_ms = now_ms
+            return self._format(now_ms, self._last_random)
+
+    @staticmethod
+    def _format(ms: int, random_part: int) -> str:
+        return _encode(ms, 10) + _encode(random_part, 16)
+
+
+def _to_ms(timestamp: datetime) -> int:
+    if timestamp.tzinfo is None:
+        return int(time.mktime(timestamp.timetuple()) * 1000) + timestamp.microsecond // 1000
+    return int(timestamp.timestamp() * 1000)
+
+
+_generator = ULIDGenerator()
+
+
+def new_ulid(timestamp: Optional[datetime] = None) -> str:
+    return _generator.new(timestamp)
+
+
+def is_ulid(value: str) -> bool:
+    return isinstance(value, str) and bool(ULID_PATTERN.match(value))
+
+
+def ulid_timestamp(value: str) -> datetime:
+    return datetime.fromtimestamp(_decode(value[:10]) / 1000, tz=timezone.utc)
@@ -0,0 +1,206 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from enum import Enum
+from typing import Callable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .dimensions import process_ids
+from .ids import new_ulid
+from .metrics import INGEST_COMMIT_SECONDS, ROWS_INGESTED
+from .models import LogEntry, insert_ignoring_duplicates
+from .rollups import RollupBuffer, update_rollups
+from .search import index_log_rows, search_backend
+from .tail import tail_broker
+
+
+def new_log_id() -> str:
+    return new_ulid()
+
+
+def insert_log_rows(db: Session, rows: List[dict], rollups: Optional[RollupBuffer] = None) -> List[dict]:
+    # one executemany in one transaction; ids are assigned here so callers can reference the rows afterwards.
+    # without a RollupBuffer the rollups are updated in the same transaction
+    if not rows:
+        return rows
+    for row in rows:
+        row.setdefault("id", new_log_id())
+    # detected (once per engine) on a separate connection, which would wait on SQLite's write lock after the insert
+    search_backend(db.get_bind())
+    inserted = _insert_new_rows(db, rows)
+    index_log_rows(db, inserted)
+    if rollups is None:
+        update_rollups(db, inserted)
+    started = time.perf_counter()
+    db.commit()
+    INGEST_COMMIT_SECONDS.observe(time.perf_counter() - started)
+    if rollups is not None:
+        rollups.add(inserted)
+    ROWS_INGESTED.inc(amount=len(inserted))
+    tail_broker.publish(inserted)
+    return rows
+
+
+def _insert_new_rows(db: Session, rows: List[dict]) -> List[dict]:
+    # rows whose id already exists are skipped by the insert; the rest are returned so retries are not counted twice
+    params = _storage_params(db, rows)
+    statement = insert_ignoring_duplicates(db, LogEntry)
+    if db.get_bind().dialect.insert_executemany_returning:
+        inserted = set(db.scalars(statement.returning(LogEntry.id), params))
+        return [row for row in rows if row["id"] in inserted]
+    existing = set(db.scalars(select(LogEntry.id).where(LogEntry.id.in_([row["id"] for row in rows]))))
+    db.execute(statement, params)
+    return [row for row in rows if row["id"] not in existing]
+
+
+def _storage_params(db: Session, rows: List[dict]) -> List[dict]:
+    # rows keep their process name for callers, the table stores the dimension id
+    ids = process_ids.ids(db.get_bind(), (row.get("process_name") for row in rows))
+    return [
+        {"id": row["id"], "level": row.get("level"), "message": row.get("message"),
+         "process_id": ids.get(row.get("process_name")), "timestamp": row.get("timestamp") or datetime.now()}
+        for row in rows
+    ]
+
+
+class Durability(str, Enum):
+    COMMIT = "commit"
+    ENQUEUE = "enqueue"
+
+
+class IngestQueueFull(Exception):
+    pass
+
+
+class IngestPipeline:
+    def __init__(self, session_factory: Callable[[], Session], max_batch: int = 1000, linger: float = 0.005,
+                 queue_size: int = 10000, durability: Durability = Durability.COMMIT, rollups: Optional[RollupBuffer] = None):
+        self.session_factory = session_factory
+        self.rollups = rollups
+        self.max_batch = max_batch
+        self.linger = linger
+        self.durability = Durability(durability)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.batches = 0
+        self.rows_committed = 0
+        self.rows_failed = 0
+        self.split_batches = 0
+        self.rejected_requests = 0
+        self.batch_rows_total = 0
+        self.batch_rows_max = 0
+        self.commit_seconds_total = 0.0
+        self.commit_seconds_max = 0.0
+
+    def submit(self, rows: List[dict]) -> Future:
+        # the returned future resolves once the rows are committed, or fails with the commit error
+        self._ensure_started()
+        for row in rows:
+            row.setdefault("id", new_log_id())
+        future = Future()
+        try:
+            self._queue.put_nowait((rows, future))
+        except queue.Full:
+            with self._lock:
+                self.rejected_requests += 1
+            raise IngestQueueFull("Ingest queue is full")
+        return future
+
+    def stop(self, timeout: float = 30.0):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put((None, None))
+            thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "durability": self.durability.value,
+                "queue_depth": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                "batches": self.batches,
+                "rows_committed": self.rows_committed,
+                "rows_failed": self.rows_failed,
+                "split_batches": self.split_batches,
+                "rejected_requests": self.rejected_requests,
+                "batch_rows_avg": self.batch_rows_total / self.batches if self.batches else 0.0,
+                "batch_rows_max": self.batch_rows_max,
+                "commit_seconds_avg": self.commit_seconds_total / self.batches if self.batches else 0.0,
+                "commit_seconds_max": self.commit_seconds_max,
+            }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="LogCenterIngest", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            pending = []
+            row_count = 0
+            deadline = None
+            while row_count < self.max_batch:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    rows, future = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if future is None:
+                    stopping = True
+                    break
+                pending.append((rows, future))
+                row_count += len(rows)
+                if deadline is None:
+                    deadline = time.monotonic() + self.linger
+            if pending:
+                self._commit(pending, row_count)
+
+    def _commit(self, pending: list, row_count: int):
+        started = time.perf_counter()
+        error = self._insert([row for rows, _ in pending for row in rows])
+        if error is None or len(pending) == 1:
+            errors = [error] * len(pending)
+        else:
+            # one bad submission fails the whole group, so each is retried in its own transaction and only
+            # the failing ones get the error; ids were assigned on submit, so the retries cannot duplicate rows
+            errors = [self._insert(rows) for rows, _ in pending]
+        elapsed = time.perf_counter() - started
+        rows_failed = sum(len(rows) for (rows, _), error in zip(pending, errors) if error is not None)
+
+        with self._lock:
+            self.batches += 1
+            self.batch_rows_total += row_count
+            self.batch_rows_max = max(self.batch_rows_max, row_count)
+            self.commit_seconds_total += elapsed
+            self.commit_seconds_max = max(self.commit_seconds_max, elapsed)
+            if error is not None and len(pending) > 1:
+                self.split_batches += 1
+            self.rows_committed += row_count - rows_failed
+            self.rows_failed += rows_failed
+
+        for (rows, future), error in zip(pending, errors):
+            if error is None:
+                future.set_result(rows)
+            else:
+                future.set_exception(error)
+
+    def _insert(self, rows: List[dict]) -> Optional[Exception]:
+        db = self.session_factory()
+        try:
+            insert_log_rows(db, rows, self.rollups)
+            return None
+        except Exception as e:
+            db.rollback()
+            return e
+        finally:
+            db.close()
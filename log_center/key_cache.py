@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# the generation is written zero-padded in place, so a reader never sees digits left over from a longer value
+GENERATION_WIDTH = 20
+
+
+class APIKeyCache:
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0, negative_ttl: float = 5.0,
+                 invalidation_file: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.invalidation_file = invalidation_file
+        self._entries = OrderedDict()  # key -> (valid, expires_at)
+        self._lock = threading.Lock()
+        self._generation_fd = None
+        self._generation_pid = None
+        self._seen_generation = self._invalidation_generation()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, key: str) -> Optional[bool]:
+        # returns the cached verdict for the key, or None when it has to be looked up
+        if not self.enabled:
+            return None
+        self._check_shared_invalidation()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, valid: bool):
+        if not self.enabled:
+            return
+        ttl = self.ttl if valid else self.negative_ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (valid, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self.invalidations += 1
+        self._notify_other_workers()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "negative_ttl": self.negative_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    # other uvicorn workers learn about invalidations through a counter in a shared file. each invalidation
+    # increments it under an exclusive lock, so two invalidations in the same clock tick still change the value
+    def _invalidation_fd(self) -> Optional[int]:
+        if not self.invalidation_file:
+            return None
+        # a forked worker opens its own descriptor, flock locks are shared by every copy of one
+        if self._generation_fd is None or self._generation_pid != os.getpid():
+            try:
+                self._generation_fd = os.open(self.invalidation_file, os.O_RDWR | os.O_CREAT, 0o644)
+            except OSError:
+                return None
+            self._generation_pid = os.getpid()
+        return self._generation_fd
+
+    def _invalidation_generation(self) -> Optional[int]:
+        fd = self._invalidation_fd()
+        if fd is None:
+            return None
+        try:
+            return int(os.pread(fd, GENERATION_WIDTH, 0) or 0)
+        except (OSError, ValueError):
+            # unreadable, or a file written by an older version
+            return None
+
+    def _check_shared_invalidation(self):
+        if not self.invalidation_file:
+            return
+        generation = self._invalidation_generation()
+        if generation != self._seen_generation:
+            self._seen_generation = generation
+            self.clear()
+
+    def _notify_other_workers(self):
+        fd = self._invalidation_fd()
+        if fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            generation = (self._invalidation_generation() or 0) + 1
+            os.pwrite(fd, str(generation).zfill(GENERATION_WIDTH).encode(), 0)
+            os.ftruncate(fd, GENERATION_WIDTH)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        self._seen_generation = generation
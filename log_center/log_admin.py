@@ -1,24 +1,26 @@
 import os
 import requests
 
+from .transport import HTTPTransport, default_transport
+
 
 class LogAdmin:
-    def __init__(self, api_url: str = None, admin_api_key: str = None):
+    def __init__(self, api_url: str = None, admin_api_key: str = None, transport: HTTPTransport = None):
         self.api_url = api_url or os.getenv("LOG_CENTER_API_URL", "http://localhost:8000")
         self.admin_api_key = admin_api_key or os.getenv("LOG_CENTER_ADMIN_KEY")
         if not self.admin_api_key:
             raise ValueError("Admin API key not found in environment variables.")
-    
-    def add_approved_user(self, owner_email: str, owner_name: str = None):
-        headers = {
+        self.transport = transport or default_transport()
+        self.headers = {
             "x-admin-api-key": self.admin_api_key,
             "Content-Type": "application/json"
         }
-        
-        data = {"owner_email": owner_email, "owner_name": owner_name}
+    
+    def add_approved_user(self, owner_email: str, owner_name: str = None):
+        data = {"email": owner_email, "name": owner_name}
         
         try:
-            response = requests.post(f"{self.api_url}/users/approve", headers=headers, json=data)
+            response = self.transport.post(f"{self.api_url}/users/approve", headers=self.headers, json=data)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -28,16 +30,10 @@ class LogAdmin:
         
     
     def request_api_key(self, owner_email: str):
-        
-        headers = {
-            "x-admin-api-key": self.admin_api_key,
-            "Content-Type": "application/json"
-        }
-        
         data = {"owner_email": owner_email}
         
         try:
-            response = requests.post(f"{self.api_url}/keys/create", headers=headers, json=data)
+            response = self.transport.post(f"{self.api_url}/keys/create", headers=self.headers, json=data)
             if response.status_code == 200:
                 return response.json()["key"]
             else:
@@ -46,12 +42,8 @@ class LogAdmin:
             raise Exception(f"Request failed: {e}")
     
     def deactivate_api_key(self, key: str):
-        headers = {
-            "x-admin-api-key": self.admin_api_key,
-            "Content-Type": "application/json"
-        }
         try:
-            response = requests.post(f"{self.api_url}/keys/deactivate/{key}", headers=headers)
+            response = self.transport.post(f"{self.api_url}/keys/deactivate/{key}", headers=self.headers)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -60,15 +52,10 @@ class LogAdmin:
             raise Exception(f"Request failed: {e}")
     
     def deactivate_user(self, owner_email: str, owner_name: str = None):
-        headers = {
-            "x-admin-api-key": self.admin_api_key,
-            "Content-Type": "application/json"
-        }
-        
-        data = {"owner_email": owner_email, "owner_name": owner_name}
+        data = {"email": owner_email, "name": owner_name}
         
         try:
-            response = requests.post(f"{self.api_url}/users/deactivate", headers=headers, json=data)
+            response = self.transport.post(f"{self.api_url}/users/deactivate", headers=self.headers, json=data)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -77,12 +64,8 @@ class LogAdmin:
             raise Exception(f"Request failed: {e}")
     
     def deactivate_api_key_by_owner(self, owner_email: str):
-        headers = {
-            "x-admin-api-key": self.admin_api_key,
-            "Content-Type": "application/json"
-        }
         try:
-            response = requests.post(f"{self.api_url}/keys/deactivate/{owner_email}", headers=headers)
+            response = self.transport.post(f"{self.api_url}/keys/deactivate/by-owner/{owner_email}", headers=self.headers)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -92,12 +75,8 @@ class LogAdmin:
     
     
     def get_active_api_keys(self):
-        headers = {
-            "x-admin-api-key": self.admin_api_key,
-            "Content-Type": "application/json"
-        }
         try:
-            response = requests.get(f"{self.api_url}/keys/active", headers=headers)
+            response = self.transport.get(f"{self.api_url}/keys/active", headers=self.headers)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -107,12 +86,8 @@ class LogAdmin:
     
     
     def get_active_api_keys_by_owner(self, owner_email: str):
-        headers = {
-            "x-admin-api-key": self.admin_api_key,
-            "Content-Type": "application/json"
-        }
         try:
-            response = requests.get(f"{self.api_url}/keys/active/{owner_email}", headers=headers)
+            response = self.transport.get(f"{self.api_url}/keys/active/{owner_email}", headers=self.headers)
             if response.status_code == 200:
                 return response.json()
             else:
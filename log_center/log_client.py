@@ -2,21 +2,47 @@ import requests
 import datetime
 import time
 import os
+import queue
+import threading
+import atexit
+from typing import Optional
+from enum import Enum
 from .models import LogLevel
+from .spool import LogSpool, claim_spool
+from .ids import new_ulid
+from .transport import HTTPTransport, backoff_delay, default_transport
+from . import wire
 
 from colorama import init, Fore, Style, Back
 
 init(autoreset=True)
 
+class OverflowPolicy(str, Enum):
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    SPILL_TO_DISK = "spill_to_disk"
+
+# control markers placed on the async queue alongside log records
+_FLUSH = object()
+_STOP = object()
+
 class LogWriter:
     def __init__(self, api_url: str, api_key: str, console_level: LogLevel = LogLevel.INFO, 
-                 log_file: str = "failed_logs.txt", max_retries: int = 3, retry_delay: float = 2.0):
+                 log_file: str = "failed_logs.txt", max_retries: int = 3, retry_delay: float = 2.0,
+                 async_mode: bool = False, batch_size: int = 500, linger: float = 1.0, queue_size: int = 10000,
+                 overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK, spool_dir: str = "log_spool",
+                 replay_batch_size: int = 500, replay_rate: float = 1000.0,
+                 wire_format: str = "auto", compression: str = "auto", min_compress_bytes: int = 1024,
+                 max_retry_delay: float = 30.0, transport: HTTPTransport = None):
         self.api_url = api_url.rstrip('/')  # Ensure no trailing slash
         self.api_key = api_key
         self.console_level = console_level
         self.log_file = log_file
         self.max_retries = max_retries
+        # retry_delay is the base of a jittered exponential backoff capped at max_retry_delay
         self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.transport = transport or default_transport()
         self.headers = {
             "x-api-key": self.api_key,
             "Content-Type": "application/json"
@@ -28,6 +54,63 @@ class LogWriter:
             "ERROR": Fore.RED
         }
         self.start_time = datetime.datetime.now()
+        
+        # batches start as plain JSON; with "auto" the first successful response says what the server also accepts
+        self.wire_format = wire_format
+        self.compression = compression
+        self.min_compress_bytes = min_compress_bytes
+        self._batch_content_type = wire.JSON if wire_format == "auto" else wire.FORMATS.get(wire_format)
+        self._batch_encoding = wire.IDENTITY if compression == "auto" else compression
+        if self._batch_content_type not in wire.content_types():
+            raise ValueError(f"Unsupported wire format {wire_format!r}, is its package installed?")
+        if self._batch_encoding not in wire.content_encodings():
+            raise ValueError(f"Unsupported compression {compression!r}, is its package installed?")
+        self._negotiated = wire_format != "auto" and compression != "auto"
+        
+        # counters for stats(); updated from the caller, worker and replay threads
+        self._stats_lock = threading.Lock()
+        self.records_sent = 0
+        self.batches_sent = 0
+        self.retries = 0
+        self.spooled_records = 0
+        self.spool_events = 0
+        self.replayed_records = 0
+        self.flushes = 0
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+        
+        self.async_mode = async_mode
+        self.batch_size = batch_size
+        self.linger = linger
+        self.overflow_policy = OverflowPolicy(overflow_policy)
+        self.dropped_count = 0
+        self._queue = None
+        self._worker = None
+        if self.async_mode:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._worker = threading.Thread(target=self._run_worker, name="LogWriterWorker", daemon=True)
+            self._worker.start()
+        
+        # failed logs go to an append-only spool that a background thread replays in batches; the directory and the
+        # thread only appear once something has to be spooled, or at startup if an earlier run left a spool behind.
+        # spool_dir=None turns spooling off and undeliverable logs are dropped
+        self.spool_dir = spool_dir
+        self.spool: Optional[LogSpool] = None
+        self._spool_lock = threading.Lock()
+        self.replay_batch_size = replay_batch_size
+        self.replay_rate = replay_rate
+        self._replay_wakeup = threading.Event()
+        self._replay_stop = threading.Event()
+        self._replayer = None
+        if spool_dir and (os.path.isdir(spool_dir) or (self.log_file and os.path.exists(self.log_file))):
+            self._open_spool()
+        atexit.register(self.close)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
     
     
     def print_header(self, process_name: str, include_start_time: bool = True):
@@ -43,33 +126,41 @@ class LogWriter:
     
     def _log_to_console(self, date_time: datetime.datetime, process_name: str, level: LogLevel, message: str):
         color = self.color_map.get(level.name, Fore.GREEN)
-        print(f"{color}{date_time.strftime("%Y-%m-%d %H:%M:%S")} | {process_name} | {level.value}: {message}{Style.RESET_ALL}")
+        print(f"{color}{date_time.strftime('%Y-%m-%d %H:%M:%S')} | {process_name} | {level.value}: {message}{Style.RESET_ALL}")
     
     def _log(self, level: LogLevel, message: str, process_name: str):
         log_time = datetime.datetime.now()
         log_data = {
+            "id": new_ulid(),
             "level": level.value,
             "message": message,
             "process_name": process_name,
             "timestamp": log_time.isoformat()
         }
         
+        if self._worker is not None and self._worker.is_alive():
+            self._enqueue(log_data)
+            return None
+        
         for attempt in range(self.max_retries):
+            if attempt:
+                self._count(retries=1)
             try:
-                response = requests.post(f"{self.api_url}/logs/", json=log_data, headers=self.headers)
+                response = self.transport.post(f"{self.api_url}/logs/", json=log_data, headers=self.headers)
                 
                 if response.status_code == 200:
+                    self._count(records_sent=1)
                     self._flush_failed_logs()
                     return response.json()
                 else:
                     print(f"Log attempt {attempt + 1} failed: {response.status_code} {response.text}")
-                    time.sleep(self.retry_delay)
+                    self._wait_before_retry(attempt, response)
             except requests.exceptions.RequestException as e:
                 print(f"Request failed: {e}")
-                time.sleep(self.retry_delay)
+                self._wait_before_retry(attempt)
         
-        self._write_to_file(log_data)
-        raise Exception(f"Failed to log message after {self.max_retries} attempts. Logged to file instead.")
+        spooled = self._write_to_file(log_data)
+        raise Exception(f"Failed to log message after {self.max_retries} attempts. {'Logged to spool instead' if spooled else 'Dropped'}.")
     
     def log_debug(self, message: str, process_name: str):
         return self._log(LogLevel.DEBUG, message, process_name)
@@ -83,36 +174,262 @@ class LogWriter:
     def log_error(self, message: str, process_name: str):
         return self._log(LogLevel.ERROR, message, process_name)
     
-    def _write_to_file(self, log_data):
-        with open(self.log_file, "a") as file:
-            file.write("|".join([log_data["timestamp"], log_data["level"], log_data["process_name"], log_data["message"]]) + "\n")
-        print("Log written to file due to API failure.")
+    def flush(self):
+        # blocks until every record queued so far has been sent or spilled to file
+        if self._worker is None or not self._worker.is_alive():
+            return
+        started = time.perf_counter()
+        self._queue.put(_FLUSH)
+        self._queue.join()
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self.flushes += 1
+            self.flush_seconds_total += elapsed
+            self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
     
-    def _flush_failed_logs(self):
-        if not os.path.exists(self.log_file):
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "records_sent": self.records_sent,
+                "batches_sent": self.batches_sent,
+                "retries": self.retries,
+                "dropped": self.dropped_count,
+                "spooled_records": self.spooled_records,
+                "spool_events": self.spool_events,
+                "replayed_records": self.replayed_records,
+                "spool_pending_bytes": self.spool.pending_bytes() if self.spool is not None else 0,
+                "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+                "wire_format": self._batch_content_type,
+                "compression": self._batch_encoding,
+                "flushes": self.flushes,
+                "flush_seconds_avg": self.flush_seconds_total / self.flushes if self.flushes else 0.0,
+                "flush_seconds_max": self.flush_seconds_max,
+            }
+    
+    def _count(self, **amounts):
+        with self._stats_lock:
+            for name, amount in amounts.items():
+                setattr(self, name, getattr(self, name) + amount)
+    
+    def close(self):
+        if self._worker is not None:
+            if self._worker.is_alive():
+                self._queue.put(_STOP)
+                self._worker.join()
+            self._worker = None
+        self._replay_stop.set()
+        self._replay_wakeup.set()
+        with self._spool_lock:
+            if self._replayer is not None:
+                self._replayer.join()
+                self._replayer = None
+            if self.spool is not None:
+                self.spool.close()
+                self.spool = None
+        atexit.unregister(self.close)
+    
+    def _enqueue(self, log_data: dict):
+        if self.overflow_policy == OverflowPolicy.BLOCK:
+            self._queue.put(log_data)
             return
         
-        with open(self.log_file, "r") as file:
-            lines = file.readlines()
-        
-        with open(self.log_file, "w") as file:
-            for line in lines:
-                timestamp, level, process_name, message = line.strip().split("|")
-                log_data = {
-                    "level": level,
-                    "message": message,
-                    "process_name": process_name,
-                    "timestamp": timestamp
-                }
+        while True:
+            try:
+                self._queue.put_nowait(log_data)
+                return
+            except queue.Full:
+                if self.overflow_policy == OverflowPolicy.SPILL_TO_DISK:
+                    self._write_to_file(log_data)
+                    return
+            try:
+                dropped = self._queue.get_nowait()
+            except queue.Empty:
+                continue
+            self._queue.task_done()
+            if dropped is _FLUSH or dropped is _STOP:
+                # never lose a control marker, put it back and drop the new record instead
+                self._queue.put(dropped)
+                self.dropped_count += 1
+                return
+            self.dropped_count += 1
+    
+    def _run_worker(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            markers = 0
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _FLUSH or item is _STOP:
+                    markers += 1
+                    stopping = item is _STOP
+                    break
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.linger
+            
+            if batch:
                 try:
-                    response = requests.post(f"{self.api_url}/logs/", json=log_data, headers=self.headers)
-                    if response.status_code != 200:
-                        file.write(line)  # Keep log if still failing
-                    else:
-                        print("Flushed a previously failed log to API.")
-                except requests.exceptions.RequestException:
-                    file.write(line)
-                    print("Failed to flush log entry.")
+                    self._send_batch(batch)
+                except Exception as e:
+                    print(f"Batch send failed: {e}")
+            for _ in range(len(batch) + markers):
+                self._queue.task_done()
+    
+    def _post_batch(self, records: list) -> requests.Response:
+        content_type, encoding = self._batch_content_type, self._batch_encoding
+        try:
+            body = wire.encode(records, content_type)
+        except ValueError:
+            # e.g. a timezone-aware timestamp in a spooled record, which only JSON can carry
+            content_type, body = wire.JSON, wire.encode(records, wire.JSON)
+        headers = {**self.headers, "Content-Type": content_type}
+        if encoding != wire.IDENTITY and len(body) >= self.min_compress_bytes:
+            body = wire.compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+        
+        response = self.transport.post(f"{self.api_url}/logs/batch", data=body, headers=headers)
+        if response.status_code == 415 and (content_type, encoding) != (wire.JSON, wire.IDENTITY):
+            print(f"Server rejected {content_type} ({encoding}), falling back to JSON")
+            self._batch_content_type, self._batch_encoding = wire.JSON, wire.IDENTITY
+            self._negotiated = True
+            return self._post_batch(records)
+        if response.status_code == 200 and not self._negotiated:
+            self._negotiate(response)
+        return response
+    
+    def _negotiate(self, response: requests.Response):
+        # older servers send neither header and the writer stays on JSON
+        accepted_types = [value.strip() for value in response.headers.get("Accept-Post", "").split(",")]
+        accepted_encodings = [value.strip() for value in response.headers.get("Accept-Encoding", "").split(",")]
+        if self.wire_format == "auto":
+            self._batch_content_type = next(
+                (content_type for content_type in (wire.MSGPACK, wire.RECORDS) if content_type in accepted_types and content_type in wire.content_types()),
+                wire.JSON,
+            )
+        if self.compression == "auto":
+            self._batch_encoding = next(
+                (encoding for encoding in (wire.ZSTD, wire.GZIP) if encoding in accepted_encodings and encoding in wire.content_encodings()),
+                wire.IDENTITY,
+            )
+        self._negotiated = True
+    
+    def _send_batch(self, batch: list):
+        for attempt in range(self.max_retries):
+            if attempt:
+                self._count(retries=1)
+            try:
+                response = self._post_batch(batch)
+                
+                if response.status_code == 200:
+                    self._count(records_sent=len(batch), batches_sent=1)
+                    result = response.json()
+                    for rejection in result.get("errors", []):
+                        print(f"Log rejected by server: {rejection['error']}")
+                    self._flush_failed_logs()
+                    return result
+                else:
+                    print(f"Batch attempt {attempt + 1} failed: {response.status_code} {response.text}")
+                    self._wait_before_retry(attempt, response)
+            except requests.exceptions.RequestException as e:
+                print(f"Request failed: {e}")
+                self._wait_before_retry(attempt)
+        
+        if self._spool_records(batch):
+            print(f"{len(batch)} logs written to spool due to API failure.")
+        else:
+            print(f"{len(batch)} logs dropped due to API failure, spooling is disabled.")
+    
+    def _wait_before_retry(self, attempt: int, response: requests.Response = None):
+        # no wait after the last attempt, the record goes straight to the spool
+        if attempt + 1 < self.max_retries:
+            time.sleep(backoff_delay(attempt, self.retry_delay, self.max_retry_delay, response))
+    
+    def _write_to_file(self, log_data) -> bool:
+        if self._spool_records([log_data]):
+            print("Log written to spool due to API failure.")
+            return True
+        print("Log dropped due to API failure, spooling is disabled.")
+        return False
+    
+    def _spool_records(self, records: list) -> bool:
+        if not self.spool_dir:
+            self._count(dropped_count=len(records))
+            return False
+        self._open_spool().append(records)
+        self._count(spooled_records=len(records), spool_events=1)
+        return True
+    
+    def _open_spool(self) -> LogSpool:
+        with self._spool_lock:
+            if self.spool is None:
+                self.spool = claim_spool(self.spool_dir)
+                self._import_legacy_log_file()
+                self._replayer = threading.Thread(target=self._run_replay, name="LogWriterReplay", daemon=True)
+                self._replayer.start()
+                if self.spool.pending_bytes():
+                    self._replay_wakeup.set()
+            return self.spool
+    
+    def _flush_failed_logs(self):
+        # called after every successful post; replay itself happens on the background thread
+        self._replay_wakeup.set()
+    
+    def _run_replay(self):
+        while not self._replay_stop.is_set():
+            self._replay_wakeup.wait()
+            self._replay_wakeup.clear()
+            while not self._replay_stop.is_set():
+                records, position = self.spool.read_batch(self.replay_batch_size)
+                if not records:
+                    if position != self.spool.checkpoint():
+                        self.spool.commit(position)
+                    break
+                started = time.monotonic()
+                if not self._replay_batch(records):
+                    break  # still failing, wait for the next successful post
+                self.spool.commit(position)
+                delay = len(records) / self.replay_rate - (time.monotonic() - started)
+                if delay > 0:
+                    self._replay_stop.wait(delay)
+    
+    def _replay_batch(self, records: list) -> bool:
+        try:
+            response = self._post_batch(records)
+        except requests.exceptions.RequestException as e:
+            print(f"Failed to replay spooled logs: {e}")
+            return False
+        if response.status_code != 200:
+            print(f"Failed to replay spooled logs: {response.status_code} {response.text}")
+            return False
+        for rejection in response.json().get("errors", []):
+            print(f"Spooled log rejected by server: {rejection['error']}")
+        self._count(replayed_records=len(records))
+        print(f"Replayed {len(records)} previously failed logs to API.")
+        return True
+    
+    def _import_legacy_log_file(self):
+        # moves logs left in the old pipe-delimited fallback file into the spool
+        if not self.log_file or not os.path.exists(self.log_file):
+            return
+        records = []
+        with open(self.log_file, "r") as file:
+            for line in file:
+                parts = line.rstrip("\n").split("|", 3)
+                if len(parts) == 4:
+                    timestamp, level, process_name, message = parts
+                    records.append({"level": level, "message": message, "process_name": process_name, "timestamp": timestamp})
+                if len(records) >= self.replay_batch_size:
+                    self.spool.append(records)
+                    records = []
+        if records:
+            self.spool.append(records)
+        os.remove(self.log_file)
 
 # Example usage
 if __name__ == "__main__":
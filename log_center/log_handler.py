@@ -0,0 +1,67 @@
+import datetime
+import logging
+import threading
+
+from .ids import new_ulid
+from .log_client import LogWriter, OverflowPolicy
+from .models import LogLevel
+
+# logging levels in between (e.g. 25) go to the nearest LogLevel below them
+LEVELS = (
+    (logging.CRITICAL, LogLevel.CRITICAL),
+    (logging.ERROR, LogLevel.ERROR),
+    (logging.WARNING, LogLevel.WARNING),
+    (logging.INFO, LogLevel.INFO),
+)
+
+
+def log_level(levelno: int) -> LogLevel:
+    for threshold, level in LEVELS:
+        if levelno >= threshold:
+            return level
+    return LogLevel.DEBUG
+
+
+class LogCenterHandler(logging.Handler):
+    # the writer's async queue plays QueueHandler and its batching worker QueueListener, so emit() only formats and enqueues.
+    # process_name is a format string over the LogRecord attributes, e.g. "{name}" (the default), "{processName}" or "billing/{name}"
+    def __init__(self, writer: LogWriter = None, api_url: str = None, api_key: str = None, process_name: str = "{name}",
+                 level: int = logging.NOTSET, **writer_options):
+        super().__init__(level)
+        self._owns_writer = writer is None
+        if writer is None:
+            if not api_url or not api_key:
+                raise ValueError("LogCenterHandler needs a LogWriter or an api_url and api_key")
+            # a full queue drops the oldest record instead of blocking the thread that logged
+            writer_options.setdefault("overflow_policy", OverflowPolicy.DROP_OLDEST)
+            writer = LogWriter(api_url, api_key, async_mode=True, **writer_options)
+        elif not writer.async_mode:
+            raise ValueError("LogCenterHandler needs a LogWriter with async_mode=True")
+        self.writer = writer
+        self.process_name = process_name
+
+    def emit(self, record: logging.LogRecord):
+        worker = self.writer._worker
+        # records from the writer's own threads (urllib3 connection logs) would feed back into its queue forever
+        if worker is None or threading.current_thread() in (worker, self.writer._replayer):
+            return
+        try:
+            self.writer._enqueue({
+                "id": new_ulid(),
+                "level": log_level(record.levelno).value,
+                "message": self.format(record),
+                "process_name": self.process_name.format_map(record.__dict__),
+                "timestamp": datetime.datetime.fromtimestamp(record.created).isoformat(),
+            })
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        try:
+            if self._owns_writer:
+                self.writer.close()
+        finally:
+            super().close()
@@ -1,16 +1,144 @@
+import csv
+import io
+import json
+import queue
+import threading
+import time
 import requests
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple, Union
 from .models import LogLevel
+from .transport import HTTPTransport, backoff_delay, default_transport
+
+
+# end-of-shard marker on the per-shard page buffers
+_DONE = object()
+
+
+def time_shards(start: Union[str, datetime], end: Union[str, datetime], shards: int) -> List[Tuple[datetime, datetime]]:
+    # [start, end) cut into equal, adjacent, non-overlapping windows; /logs/search treats end_date as exclusive too
+    start = datetime.fromisoformat(start) if isinstance(start, str) else start
+    end = datetime.fromisoformat(end) if isinstance(end, str) else end
+    if end <= start:
+        raise ValueError("end must be after start")
+    step = (end - start) / max(1, shards)
+    bounds = [start + step * index for index in range(max(1, shards))] + [end]
+    return [(lower, upper) for lower, upper in zip(bounds, bounds[1:]) if lower < upper]
+
+
+def range_params(level: Union[LogLevel, List[LogLevel], None], process_name: Union[str, List[str], None], keyword: Optional[str],
+                 page_size: int, newest_first: bool) -> dict:
+    # a single level or process name is accepted as well as a list
+    level = [level] if isinstance(level, str) else level
+    process_name = [process_name] if isinstance(process_name, str) else process_name
+    return {
+        "level": [value.value if isinstance(value, LogLevel) else value for value in level or []],
+        "process_name": list(process_name or []),
+        "keyword": keyword,
+        "order": "desc" if newest_first else "asc",
+        "limit": page_size,
+    }
+
+
+def should_retry(status_code: int) -> bool:
+    # 429 from a full ingest queue or overloaded server, 5xx from a proxy or a crashed worker; other errors won't go away
+    return status_code == 429 or status_code >= 500
+
+
+class LogSearch:
+    # fluent builder for /logs/search: log_query.search().level(LogLevel.ERROR).process("api").since("2025-03-01").keyword("timeout").all()
+    def __init__(self, log_query: "LogQuery"):
+        self._log_query = log_query
+        self._params = {"level": [], "process_name": []}
+
+    def level(self, *levels: LogLevel) -> "LogSearch":
+        self._params["level"] += [level.value if isinstance(level, LogLevel) else level for level in levels]
+        return self
+
+    def process(self, *process_names: str) -> "LogSearch":
+        self._params["process_name"] += list(process_names)
+        return self
+
+    def since(self, start: Union[str, datetime]) -> "LogSearch":
+        self._params["start_date"] = start.isoformat() if isinstance(start, datetime) else start
+        return self
+
+    def until(self, end: Union[str, datetime]) -> "LogSearch":
+        # exclusive
+        self._params["end_date"] = end.isoformat() if isinstance(end, datetime) else end
+        return self
+
+    def between(self, start: Union[str, datetime], end: Union[str, datetime]) -> "LogSearch":
+        return self.since(start).until(end)
+
+    def keyword(self, keyword: str) -> "LogSearch":
+        self._params["keyword"] = keyword
+        return self
+
+    def newest_first(self) -> "LogSearch":
+        self._params["order"] = "desc"
+        return self
+
+    def by_relevance(self) -> "LogSearch":
+        self._params["order"] = "relevance"
+        return self
+
+    def limit(self, limit: int) -> "LogSearch":
+        self._params["limit"] = limit
+        return self
+
+    def all(self) -> List[dict]:
+        # a single page, at most limit rows
+        return self._log_query._get(f"{self._log_query.api_url}/logs/search", params=self._params)
+
+    def __iter__(self) -> Iterator[dict]:
+        # every matching log, following the cursors page by page
+        url = f"{self._log_query.api_url}/logs/search"
+        cursor = None
+        while True:
+            logs, cursor = self._log_query._get_page(url, params={**self._params, "cursor": cursor})
+            yield from logs
+            if not cursor or self._params.get("order") == "relevance":
+                return
+
+    def explain(self) -> dict:
+        try:
+            response = self._log_query.transport.get(f"{self._log_query.api_url}/logs/search", headers=self._log_query.headers,
+                                                     params={**self._params, "explain": "true"})
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"Failed to explain log search: {e}")
+            return {}
 
 
 class LogQuery:
-    def __init__(self, api_url: str, api_key: str):
+    def __init__(self, api_url: str, api_key: str, transport: HTTPTransport = None):
         self.api_url = api_url.rstrip('/')
+        self.transport = transport or default_transport()
         self.headers = {
             "x-api-key": api_key,
             "Content-Type": "application/json"
         }
     
+    def get_logs(self, limit: Optional[int] = None) -> List[dict]:
+        url = f"{self.api_url}/logs/"
+        return self._get(url, params={"limit": limit})
+    
+    def search(self) -> LogSearch:
+        return LogSearch(self)
+    
+    def iter_logs(self, endpoint: str = "/logs/", page_size: int = 1000) -> Iterator[dict]:
+        # follows the X-Next-Cursor header so callers can walk any /logs route without holding it all in memory
+        url = f"{self.api_url}/{endpoint.lstrip('/')}"
+        cursor = None
+        while True:
+            logs, cursor = self._get_page(url, params={"limit": page_size, "cursor": cursor})
+            yield from logs
+            if not cursor:
+                return
+    
     def get_logs_by_level(self, level: LogLevel) -> List[dict]:
         url = f"{self.api_url}/logs/level/{level.value}"
         return self._get(url)
@@ -20,7 +148,8 @@ class LogQuery:
         return self._get(url)
     
     def get_logs_by_process_and_level(self, process_name: str, level: LogLevel) -> List[dict]:
-        url = f"{self.api_url}/logs/filter/{process_name}/level/{level.value}"
+        url = f"{self.api_url}/logs/filter/{process_name}/{level.value}"
+        return self._get(url)
     
     def get_logs_by_message_keyword(self, keyword: str) -> List[dict]:
         url = f"{self.api_url}/logs/filter/messages/{keyword}"
@@ -42,14 +171,190 @@ class LogQuery:
         url = f"{self.api_url}/logs/filter/date-range/{start_date}/{end_date}"
         return self._get(url)
     
-    def _get(self, url: str):
+    def get_stats(self, bucket: Optional[str] = None, group_by: Optional[List[str]] = None, start_date: Optional[str] = None,
+                  end_date: Optional[str] = None, process_name: Optional[str] = None, level: Optional[LogLevel] = None) -> List[dict]:
+        # counts from the server's rollups; bucket is "minute", "hour" or "day", group_by any of "process_name" and "level"
+        url = f"{self.api_url}/logs/stats"
+        params = {
+            "bucket": bucket,
+            "group_by": group_by or [],
+            "start_date": start_date,
+            "end_date": end_date,
+            "process_name": process_name,
+            "level": level.value if level else None,
+        }
+        return self._get(url, params=params)
+
+    def get_level_counts(self, process_name: Optional[str] = None, start_date: Optional[str] = None, end_date: Optional[str] = None) -> dict:
+        stats = self.get_stats(group_by=["level"], start_date=start_date, end_date=end_date, process_name=process_name)
+        return {row["level"]: row["count"] for row in stats}
+
+    def get_error_counts(self, bucket: str = "minute", start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[dict]:
+        # errors per process per bucket, the shape dashboards chart
+        return self.get_stats(bucket=bucket, group_by=["process_name"], start_date=start_date, end_date=end_date, level=LogLevel.ERROR)
+
+    def tail(self, process_name: Optional[str] = None, level: Optional[LogLevel] = None, keyword: Optional[str] = None,
+             reconnect: bool = True, retry_delay: float = 1.0, max_retry_delay: float = 30.0) -> Iterator[dict]:
+        # yields logs as they are ingested; records the server dropped because we fell behind are reported, not raised
+        params = {"process_name": process_name, "level": level.value if level else None, "keyword": keyword}
+        attempt = 0
+        while True:
+            try:
+                with self.transport.get(f"{self.api_url}/logs/tail", headers=self.headers, params=params, stream=True,
+                                        timeout=(self.transport.timeout[0], 60)) as response:
+                    response.raise_for_status()
+                    attempt = 0
+                    event, data = "message", []
+                    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                        if line:
+                            field, _, value = line.partition(":")
+                            if field == "event":
+                                event = value.strip()
+                            elif field == "data":
+                                data.append(value[1:] if value.startswith(" ") else value)
+                            continue
+                        if data:
+                            payload = json.loads("\n".join(data))
+                            if event == "dropped":
+                                print(f"Live tail dropped {payload['dropped']} logs, the consumer is too slow")
+                            else:
+                                yield payload
+                        event, data = "message", []
+            except requests.exceptions.HTTPError as e:
+                print(f"Failed to tail logs: {e}")
+                # 503 means the server has too many tail subscribers right now
+                if e.response.status_code != 503 or not reconnect:
+                    return
+            except requests.exceptions.RequestException as e:
+                print(f"Live tail disconnected: {e}")
+            if not reconnect:
+                return
+            time.sleep(backoff_delay(attempt, retry_delay, max_retry_delay))
+            attempt += 1
+
+    def export_logs(self, level: Optional[LogLevel] = None, process_name: Optional[str] = None, keyword: Optional[str] = None,
+                    start_date: Optional[str] = None, end_date: Optional[str] = None, format: str = "ndjson") -> Iterator[dict]:
+        # parses the export stream line by line so arbitrarily large pulls run in constant memory
+        params = {
+            "format": format,
+            "level": level.value if level else None,
+            "process_name": process_name,
+            "keyword": keyword,
+            "start_date": start_date,
+            "end_date": end_date,
+        }
+        with self.transport.get(f"{self.api_url}/logs/export", headers=self.headers, params=params, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            stream = io.TextIOWrapper(response.raw, encoding="utf-8", newline="")
+            if format == "csv":
+                yield from csv.DictReader(stream)
+            else:
+                for line in stream:
+                    if line.strip():
+                        yield json.loads(line)
+    
+    def get_archived_logs(self, start_date: Optional[str] = None, end_date: Optional[str] = None, level: Optional[LogLevel] = None,
+                          process_name: Optional[str] = None, keyword: Optional[str] = None) -> Iterator[dict]:
+        # logs removed from the database by the retention policy, read back from the server's archive
+        params = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "level": level.value if level else None,
+            "process_name": process_name,
+            "keyword": keyword,
+        }
+        with self.transport.get(f"{self.api_url}/logs/archive", headers=self.headers, params=params, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    yield json.loads(line)
+    
+    def fetch_range(self, start: Union[str, datetime], end: Union[str, datetime], level: Union[LogLevel, List[LogLevel], None] = None,
+                    process_name: Union[str, List[str], None] = None, keyword: Optional[str] = None, shards: int = 8, concurrency: int = 4,
+                    page_size: int = 1000, newest_first: bool = False, max_retries: int = 3, retry_delay: float = 0.5,
+                    prefetch_pages: int = 2) -> Iterator[dict]:
+        # splits [start, end) into time shards fetched by a thread pool, yielding rows in timestamp order; shards ahead of the
+        # consumer buffer at most prefetch_pages pages. A shard that still fails after max_retries raises instead of leaving a gap
+        url = f"{self.api_url}/logs/search"
+        params = range_params(level, process_name, keyword, page_size, newest_first)
+        ranges = time_shards(start, end, shards)
+        if newest_first:
+            ranges.reverse()
+        stop = threading.Event()
+        buffers = [queue.Queue(maxsize=max(1, prefetch_pages)) for _ in ranges]
+
+        def put(buffer: queue.Queue, item) -> bool:
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def fetch_shard(buffer: queue.Queue, lower: datetime, upper: datetime):
+            cursor = None
+            shard_params = {**params, "start_date": lower.isoformat(), "end_date": upper.isoformat()}
+            try:
+                while not stop.is_set():
+                    logs, cursor = self._fetch_page(url, {**shard_params, "cursor": cursor}, max_retries, retry_delay, stop)
+                    if not put(buffer, logs) or not cursor:
+                        break
+            except Exception as e:
+                put(buffer, e)
+                return
+            put(buffer, _DONE)
+
+        # executor queues are FIFO, so the earliest shards are always the ones being fetched first
+        pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="LogQueryShard")
+        try:
+            for buffer, (lower, upper) in zip(buffers, ranges):
+                pool.submit(fetch_shard, buffer, lower, upper)
+            for buffer in buffers:
+                while True:
+                    item = buffer.get()
+                    if item is _DONE:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield from item
+        finally:
+            # also runs when the caller stops iterating early; workers notice between pages
+            stop.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _fetch_page(self, url: str, params: dict, max_retries: int, retry_delay: float,
+                    stop: Optional[threading.Event] = None) -> Tuple[List[dict], Optional[str]]:
+        # unlike _get_page, errors are raised once the retries are used up
+        for attempt in range(max_retries):
+            try:
+                response = self.transport.get(url, headers=self.headers, params=params)
+                if not should_retry(response.status_code) or attempt + 1 == max_retries:
+                    response.raise_for_status()
+                    return response.json(), response.headers.get("X-Next-Cursor")
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt + 1 == max_retries:
+                    raise
+                response = None
+            delay = backoff_delay(attempt, retry_delay, 30.0, response)
+            if stop is not None and stop.wait(delay):
+                break
+            if stop is None:
+                time.sleep(delay)
+        return [], None
+    
+    def _get(self, url: str, params: Optional[dict] = None):
+        return self._get_page(url, params)[0]
+    
+    def _get_page(self, url: str, params: Optional[dict] = None) -> Tuple[List[dict], Optional[str]]:
         try:
-            response = requests.get(url, headers=self.headers)
+            response = self.transport.get(url, headers=self.headers, params=params)
             response.raise_for_status()
-            return response.json()
+            return response.json(), response.headers.get("X-Next-Cursor")
         except requests.exceptions.RequestException as e:
             print(f"Failed to retrieve logs: {e}")
-            return []
+            return [], None
         
     
 # Example usage
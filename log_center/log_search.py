@@ -0,0 +1,35 @@
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional
+
+from sqlalchemy.orm import Query, Session
+
+from .models import LogEntry
+from .search import search_filter
+
+
+class SearchOrder(str, Enum):
+    ASC = "asc"
+    DESC = "desc"
+    RELEVANCE = "relevance"
+
+
+def _matching(column, values: List[str]):
+    # a single value compiles to = so the planner can use the index ordering as well
+    return column == values[0] if len(values) == 1 else column.in_(values)
+
+
+def filter_logs(query: Query, db: Session, levels: Optional[List[str]] = None, process_names: Optional[List[str]] = None,
+                start: Optional[datetime] = None, end: Optional[datetime] = None, keyword: Optional[str] = None) -> Query:
+    # every filter is optional and they combine with AND into one statement; the time window is [start, end)
+    if levels:
+        query = query.filter(_matching(LogEntry.level, levels))
+    if process_names:
+        query = query.filter(_matching(LogEntry.process_name, process_names))
+    if start is not None:
+        query = query.filter(LogEntry.timestamp >= start)
+    if end is not None:
+        query = query.filter(LogEntry.timestamp < end)
+    if keyword:
+        query = query.filter(search_filter(db, keyword))
+    return query
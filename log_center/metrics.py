@@ -0,0 +1,242 @@
+import bisect
+import os
+import threading
+import time
+import weakref
+from typing import Callable, Dict, Iterator, Sequence, Tuple
+
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Prometheus text format, kept in process with no client library; each uvicorn worker reports its own numbers
+METRICS_ENABLED = os.getenv("LOG_CENTER_METRICS", "true").lower() == "true"
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_KINDS = {"SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA", "BEGIN", "COMMIT", "ROLLBACK"}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.type}"
+        yield from self.samples()
+
+    def samples(self) -> Iterator[str]:
+        return iter(())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # labels -> per-bucket counts (the last one is +Inf), then the sum
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted((labels, list(state)) for labels, state in self._values.items())
+        for labels, state in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.label_names, labels, [('le', _number(bound))])} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {_number(state[-1])}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}"
+
+
+class CallbackMetric(Metric):
+    # read at scrape time from state kept elsewhere, e.g. the stats() of the ingest pipeline
+    def __init__(self, name: str, help: str, type: str, callback: Callable, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.type = type
+        self.callback = callback
+
+    def samples(self) -> Iterator[str]:
+        try:
+            value = self.callback()
+        except Exception:
+            return
+        if not isinstance(value, dict):
+            value = {(): value}
+        for labels, number in sorted(value.items()):
+            if number is not None:
+                yield f"{self.name}{_labels(self.label_names, labels)} {_number(number)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        # the first registration wins, so re-importing a module does not duplicate or reset a metric
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def callback(self, name: str, help: str, type: str, callback: Callable, labels: Sequence[str] = ()) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, type, callback, labels))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter(
+    "log_center_http_requests_total", "Requests handled, by route template and status", ("method", "route", "status"))
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "log_center_http_request_duration_seconds", "Time spent in route handlers, streaming bodies excluded", ("method", "route"))
+DB_SESSION_SECONDS = registry.histogram(
+    "log_center_db_session_duration_seconds", "How long a request held its database session", ("engine",))
+DB_QUERIES = registry.counter("log_center_db_queries_total", "Statements executed", ("engine", "statement"))
+DB_QUERY_SECONDS = registry.histogram("log_center_db_query_duration_seconds", "Statement execution time", ("engine", "statement"))
+DB_POOL_CHECKOUT_SECONDS = registry.histogram(
+    "log_center_db_pool_checkout_duration_seconds", "Time spent waiting for a pooled connection, including opening new ones", ("engine",))
+ROWS_INGESTED = registry.counter("log_center_rows_ingested_total", "Log rows written; retried duplicates are not counted")
+INGEST_COMMIT_SECONDS = registry.histogram("log_center_ingest_commit_duration_seconds", "Time to commit one ingest transaction")
+ROWS_RETURNED = registry.counter("log_center_rows_returned_total", "Log rows sent to clients", ("response",))
+API_KEY_CHECKS = registry.counter("log_center_api_key_checks_total", "API key verifications", ("source", "result"))
+API_KEY_LOOKUP_SECONDS = registry.histogram("log_center_api_key_lookup_duration_seconds", "Database lookups on API key cache misses")
+
+
+class TimedRoute(APIRoute):
+    # route_class for the routers: one counter and one histogram update per request, labelled with the path template
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if not METRICS_ENABLED:
+            return handler
+        route = self.path
+
+        async def timed_handler(request):
+            started = time.perf_counter()
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                return response
+            except HTTPException as e:
+                status = e.status_code
+                raise
+            except RequestValidationError:
+                status = 422
+                raise
+            finally:
+                HTTP_REQUESTS.inc(request.method, route, str(status))
+                HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, route)
+
+        return timed_handler
+
+
+def _statement_kind(statement: str) -> str:
+    kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return kind if kind in STATEMENT_KINDS else "OTHER"
+
+
+def instrument_engine(engine: Engine, name: str):
+    # cursor events for statement counts and durations, and a timed pool.connect for checkout waits
+    if not METRICS_ENABLED or engine in _engines:
+        return
+    _engines.add(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("log_center_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["log_center_query_started"].pop()
+        kind = _statement_kind(statement)
+        DB_QUERIES.inc(name, kind)
+        DB_QUERY_SECONDS.observe(time.perf_counter() - started, name, kind)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        # after_cursor_execute does not run for failed statements
+        if context.connection is not None and context.connection.info.get("log_center_query_started"):
+            context.connection.info["log_center_query_started"].pop()
+
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started, name)
+
+    pool.connect = timed_connect
+    _pools[name] = pool
+
+
+_engines = weakref.WeakSet()
+_pools = {}
+registry.callback(
+    "log_center_db_pool_checked_out", "Connections currently checked out", "gauge",
+    lambda: {(name,): pool.checkedout() for name, pool in _pools.items() if hasattr(pool, "checkedout")}, ("engine",),
+)
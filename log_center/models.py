@@ -1,31 +1,195 @@
-from sqlalchemy import Column, String, DateTime, create_engine, Boolean, ForeignKey
+from sqlalchemy import Column, String, DateTime, Integer, SmallInteger, create_engine, Boolean, ForeignKey, Index, event, exc, insert, select
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.hybrid import Comparator, hybrid_property
 from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.sql import operators
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
 from enum import Enum
+import itertools
+import threading
+import time
 from dotenv import load_dotenv
 from sqlalchemy.engine.url import make_url
 import os
 
+from .ids import new_ulid
+from .metrics import DB_SESSION_SECONDS, instrument_engine
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("LOG_CENTER_DATABASE_URL", "sqlite:///./logs.db")
 
 
 
+# async drivers and the sync driver used for admin routes, create_database and background threads
+ASYNC_DRIVERS = {
+    "aiosqlite": "pysqlite",
+    "asyncpg": "psycopg2",
+    "aiomysql": "pymysql",
+    "asyncmy": "pymysql",
+}
+
+def sqlite_connect_args(url):
+    return {"check_same_thread": False} if url.drivername.startswith("sqlite") else {}
+
+def sync_driver_url(url):
+    return url.set(drivername=f"{url.get_backend_name()}+{ASYNC_DRIVERS[url.get_driver_name()]}") if url.get_driver_name() in ASYNC_DRIVERS else url
+
 url = make_url(DATABASE_URL)
-connect_args = {"check_same_thread": False} if url.drivername.startswith("sqlite") else {}
+connect_args = sqlite_connect_args(url)
+
+ASYNC_DATABASE = url.get_driver_name() in ASYNC_DRIVERS
+sync_url = sync_driver_url(url)
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+# tuned SQLite: WAL lets reads run while a write is in progress, synchronous=NORMAL only fsyncs the WAL at checkpoints
+SQLITE = url.get_backend_name() == "sqlite"
+SQLITE_TUNED = SQLITE and os.getenv("LOG_CENTER_SQLITE_TUNED", "false").lower() == "true"
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("LOG_CENTER_SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("LOG_CENTER_SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("LOG_CENTER_SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    # negative means KiB, so -65536 is 64 MB per connection
+    "cache_size": int(os.getenv("LOG_CENTER_SQLITE_CACHE_SIZE", -64 * 1024)),
+    "busy_timeout": int(os.getenv("LOG_CENTER_SQLITE_BUSY_TIMEOUT_MS", 5000)),
+}
+# ingest (and retention) go through one thread on one connection so writers never wait on each other's lock;
+# an in-memory database exists per connection, so it can't have a separate writer
+SQLITE_WRITER = (
+    SQLITE_TUNED and url.database not in (None, "", ":memory:")
+    and os.getenv("LOG_CENTER_SQLITE_WRITER", "true").lower() == "true"
+)
+
+def tune_sqlite(engine):
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+engine = create_engine(sync_url, connect_args=connect_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_engine(engine, "sync")
 Base = declarative_base()
 
+writer_engine = engine
+WriterSessionLocal = SessionLocal
+if SQLITE_WRITER:
+    writer_engine = create_engine(sync_url, connect_args=connect_args, pool_size=1, max_overflow=0)
+    WriterSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=writer_engine)
+    instrument_engine(writer_engine, "writer")
+if SQLITE_TUNED:
+    tune_sqlite(engine)
+    if writer_engine is not engine:
+        tune_sqlite(writer_engine)
+
+# comma separated read replicas for the GET routes; the primary serves reads when none is set or all are down
+READ_DATABASE_URLS = [value.strip() for value in os.getenv("LOG_CENTER_READ_DATABASE_URL", "").split(",") if value.strip()]
+READ_REPLICA_RETRY = float(os.getenv("LOG_CENTER_READ_REPLICA_RETRY", 30))
+
+class ReadReplicas:
+    # round robin over the replicas; one that can't hand out a connection is skipped for retry_after seconds
+    def __init__(self, engines: list, fallback: sessionmaker, retry_after: float):
+        self.engines = engines
+        self.fallback = fallback
+        self.retry_after = retry_after
+        self._sessions = [sessionmaker(autocommit=False, autoflush=False, bind=read_engine) for read_engine in engines]
+        self._down_until = [0.0] * len(engines)
+        self._failures = [0] * len(engines)
+        self._fallbacks = 0
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def session(self) -> Session:
+        for _ in range(len(self._sessions)):
+            index = next(self._next) % len(self._sessions)
+            if self._down_until[index] > time.monotonic():
+                continue
+            db = self._sessions[index]()
+            try:
+                # checks a connection out now (pre-pinged), so a dead replica fails here rather than mid-request
+                db.connection()
+                return db
+            except exc.DBAPIError:
+                db.close()
+                with self._lock:
+                    self._down_until[index] = time.monotonic() + self.retry_after
+                    self._failures[index] += 1
+        if self._sessions:
+            with self._lock:
+                self._fallbacks += 1
+        return self.fallback()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "replicas": [
+                    {"url": read_engine.url.render_as_string(hide_password=True), "healthy": down_until <= now, "failures": failures}
+                    for read_engine, down_until, failures in zip(self.engines, self._down_until, self._failures)
+                ],
+                "primary_fallbacks": self._fallbacks,
+            }
+
+read_engines = []
+for index, read_url in enumerate(map(make_url, READ_DATABASE_URLS)):
+    read_engine = create_engine(sync_driver_url(read_url), connect_args=sqlite_connect_args(read_url), pool_pre_ping=True)
+    instrument_engine(read_engine, f"replica{index}")
+    if SQLITE_TUNED and read_url.get_backend_name() == "sqlite":
+        tune_sqlite(read_engine)
+    read_engines.append(read_engine)
+read_replicas = ReadReplicas(read_engines, SessionLocal, READ_REPLICA_RETRY)
+
+async_engine = None
+AsyncSessionLocal = None
+if ASYNC_DATABASE:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine = create_async_engine(url, connect_args=connect_args)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    instrument_engine(async_engine.sync_engine, "async")
+    if SQLITE_TUNED:
+        tune_sqlite(async_engine.sync_engine)
+
 def get_db():
     db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        yield db
+    finally:
+        db.close()
+        DB_SESSION_SECONDS.observe(time.perf_counter() - started, "sync")
+
+def get_read_db():
+    db = read_replicas.session()
+    started = time.perf_counter()
     try:
         yield db
     finally:
         db.close()
+        DB_SESSION_SECONDS.observe(time.perf_counter() - started, "read")
+
+async def get_async_db():
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        finally:
+            DB_SESSION_SECONDS.observe(time.perf_counter() - started, "async")
+
+def insert_ignoring_duplicates(db: Session, model):
+    # client-generated ids make retried batches safe: rows that already exist are skipped instead of failing the batch
+    dialect = (db.get_bind() if isinstance(db, Session) else db).dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(model).on_conflict_do_nothing()
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+        return postgresql_insert(model).on_conflict_do_nothing()
+    if dialect.startswith("mysql"):
+        return insert(model).prefix_with("IGNORE")
+    return insert(model)
 
 class LogLevel(str, Enum):
     DEBUG = "DEBUG"
@@ -34,6 +198,42 @@ class LogLevel(str, Enum):
     ERROR = "ERROR"
     CRITICAL = "CRITICAL"
 
+# stored codes follow the logging module's numeric levels
+LEVEL_CODES = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+LEVEL_NAMES = {code: name for name, code in LEVEL_CODES.items()}
+
+class LevelType(TypeDecorator):
+    # level names in Python, small integers in the table and its indexes; unknown names bind as NULL and match nothing
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return LEVEL_CODES.get(value.value if isinstance(value, LogLevel) else str(value).upper())
+
+    def process_result_value(self, value, dialect):
+        return LEVEL_NAMES.get(value) if value is not None else None
+
+class ProcessNameComparator(Comparator):
+    # compares on process_id through an uncorrelated lookup in processes, so the logs indexes on process_id still apply
+    def __init__(self, cls):
+        self.cls = cls
+        super().__init__(select(Process.name).where(Process.id == cls.process_id).scalar_subquery())
+
+    def operate(self, op, *other, **kwargs):
+        if op in (operators.eq, operators.ne) and other[0] is not None:
+            matched = self.cls.process_id == select(Process.id).where(Process.name == other[0]).scalar_subquery()
+            return matched if op is operators.eq else ~matched
+        if op in (operators.in_op, operators.not_in_op):
+            ids = select(Process.id).where(Process.name.in_(other[0]))
+            return self.cls.process_id.in_(ids) if op is operators.in_op else self.cls.process_id.not_in(ids)
+        if op in (operators.eq, operators.is_) and other[0] is None:
+            return self.cls.process_id.is_(None)
+        if op in (operators.ne, operators.is_not) and other[0] is None:
+            return self.cls.process_id.is_not(None)
+        return op(self.expression, *other, **kwargs)
+
 class APIKey(Base):
     __tablename__ = "api_keys"
     key = Column(String, primary_key=True, index=True)
@@ -41,24 +241,63 @@ class APIKey(Base):
     owner_email = Column(String, ForeignKey("key_holders.email"))
     deactivated_at = Column(DateTime, nullable=True)
     active = Column(Boolean, default=True)
+    owner = relationship("KeyHolder", back_populates="keys")
     
     def deactivate_key(self):
         self.active = False
         self.deactivated_at = datetime.now()
 
+class Process(Base):
+    # dimension table for LogEntry.process_name: a few hundred names shared by millions of log rows
+    __tablename__ = "processes"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, unique=True, nullable=False)
+
 class LogEntry(Base):
     __tablename__ = "logs"
-    id = Column(String, primary_key=True, index=True)
-    level = Column(String, index=True)
+    id = Column(String, primary_key=True, default=lambda: new_ulid())
+    level = Column(LevelType)
     message = Column(String)
-    process_name = Column(String, index=True)
+    process_id = Column(Integer, ForeignKey("processes.id"))
     timestamp = Column(DateTime, default=datetime.now)
+    process = relationship(Process, lazy="joined")
+    
+    # every query route orders by (timestamp, id), so each filter column leads an index that ends with them
+    __table_args__ = (
+        Index("ix_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_logs_level_timestamp", "level", "timestamp", "id"),
+        Index("ix_logs_process_id_timestamp", "process_id", "timestamp", "id"),
+        Index("ix_logs_process_id_level_timestamp", "process_id", "level", "timestamp", "id"),
+    )
+
+    @hybrid_property
+    def process_name(self):
+        return self.process.name if self.process is not None else None
+
+    @process_name.comparator
+    def process_name(cls):
+        return ProcessNameComparator(cls)
+
+class LogToken(Base):
+    # portable inverted index on LogEntry.message for databases without a native full-text index
+    __tablename__ = "log_tokens"
+    token = Column(String, primary_key=True)
+    log_id = Column(String, primary_key=True)
+
+class LogRollup(Base):
+    # log counts per time bucket, process and level, kept up to date on ingest so /logs/stats never scans logs
+    __tablename__ = "log_rollups"
+    bucket = Column(String, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    process_name = Column(String, primary_key=True)
+    level = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
     
 class KeyHolder(Base):
     __tablename__ = "key_holders"
     email = Column(String, primary_key=True, index=True)
     name = Column(String, nullable=True)
-    keys = relationship("APIKey", back_populates="api_key")
+    keys = relationship("APIKey", back_populates="owner")
     created_at = Column(DateTime, default=datetime.now)
     active = Column(Boolean, default=True)
     deactivated_at = Column(DateTime, nullable=True)
@@ -0,0 +1,56 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+from .models import LogEntry
+
+DEFAULT_PAGE_SIZE = int(os.getenv("LOG_CENTER_DEFAULT_PAGE_SIZE", 1000))
+MAX_PAGE_SIZE = int(os.getenv("LOG_CENTER_MAX_PAGE_SIZE", 10000))
+
+
+def encode_cursor(timestamp: datetime, log_id: str) -> str:
+    raw = json.dumps([timestamp.isoformat(), log_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, log_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), str(log_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def page_query(query: Query, limit: int, cursor: Optional[str] = None, descending: bool = False) -> Query:
+    # keyset pagination over (timestamp, id): each page starts with an index seek past the previous page's last row
+    if cursor:
+        timestamp, log_id = decode_cursor(cursor)
+        if descending:
+            query = query.filter(or_(LogEntry.timestamp < timestamp, and_(LogEntry.timestamp == timestamp, LogEntry.id < log_id)))
+        else:
+            query = query.filter(or_(LogEntry.timestamp > timestamp, and_(LogEntry.timestamp == timestamp, LogEntry.id > log_id)))
+
+    if descending:
+        query = query.order_by(LogEntry.timestamp.desc(), LogEntry.id.desc())
+    else:
+        query = query.order_by(LogEntry.timestamp, LogEntry.id)
+
+    # one extra row tells us whether another page exists without a trailing empty request
+    return query.limit(limit + 1)
+
+
+def paginate(query: Query, limit: int, cursor: Optional[str] = None, descending: bool = False):
+    rows = page_query(query, limit, cursor, descending).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        # a limit of 0 leaves nothing to take the cursor from
+        if rows:
+            next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+    return rows, next_cursor
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from .models import LogEntry
+from .pagination import DEFAULT_PAGE_SIZE
+from .search import search_filter
+from .rollups import stats_query
+from .log_search import filter_logs
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    prefix = "EXPLAIN QUERY PLAN " if compiler.dialect.name == "sqlite" else "EXPLAIN "
+    return prefix + compiler.process(element.statement, **kw)
+
+
+def _page(statement, descending: bool = False):
+    # mirrors pagination.paginate for a page that resumes from a cursor
+    timestamp, log_id = datetime.now() - timedelta(days=1), ""
+    if descending:
+        statement = statement.where(or_(LogEntry.timestamp < timestamp, and_(LogEntry.timestamp == timestamp, LogEntry.id < log_id)))
+        statement = statement.order_by(LogEntry.timestamp.desc(), LogEntry.id.desc())
+    else:
+        statement = statement.where(or_(LogEntry.timestamp > timestamp, and_(LogEntry.timestamp == timestamp, LogEntry.id > log_id)))
+        statement = statement.order_by(LogEntry.timestamp, LogEntry.id)
+    return statement.limit(DEFAULT_PAGE_SIZE + 1)
+
+
+def endpoint_queries(engine: Engine) -> Dict[str, object]:
+    logs = select(LogEntry)
+    since = datetime.now() - timedelta(days=7)
+    with Session(engine) as db:
+        keyword = search_filter(db, "connection timeout")
+        combined = filter_logs(logs, db, ["ERROR", "CRITICAL"], ["process"], since, datetime.now(), "connection timeout")
+    return {
+        "GET /logs/": _page(logs),
+        "GET /logs/level/{level}": _page(logs.where(LogEntry.level == "ERROR")),
+        "GET /logs/process/{process_name}": _page(logs.where(LogEntry.process_name == "process")),
+        "GET /logs/filter/{process_name}/{level}": _page(logs.where(LogEntry.process_name == "process", LogEntry.level == "ERROR")),
+        "GET /logs/filter/messages/{keyword}": _page(logs.where(keyword)),
+        "GET /logs/filter/{process_name}/messages/{keyword}": _page(logs.where(LogEntry.process_name == "process", keyword)),
+        "GET /logs/recent/{limit}": _page(logs, descending=True),
+        "GET /logs/date/{date}": _page(logs.where(LogEntry.timestamp >= since)),
+        "GET /logs/filter/date-range/{start_date}/{end_date}": _page(logs.where(LogEntry.timestamp >= since, LogEntry.timestamp <= datetime.now())),
+        "GET /logs/search": _page(combined, descending=True),
+        "GET /logs/stats": stats_query("minute", ["process_name"], since, datetime.now(), level="ERROR"),
+    }
+
+
+def explain(engine: Engine, statement, force_index: bool = True) -> List[str]:
+    with engine.connect() as conn:
+        if force_index and engine.dialect.name == "postgresql":
+            # small or freshly created tables make sequential scans look cheaper, we want to know an index is usable;
+            # SET LOCAL ends with the transaction, so the pooled connection goes back unchanged
+            conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        result = conn.execute(Explain(statement))
+        if engine.dialect.name == "sqlite":
+            return [row[-1] for row in result]
+        if engine.dialect.name.startswith("mysql"):
+            return [str(dict(row._mapping)) for row in result]
+        return [str(row[0]) for row in result]
+
+
+def uses_index(engine: Engine, plan: List[str]) -> bool:
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        return not any(line.startswith("SCAN") and "INDEX" not in line for line in plan)
+    if dialect == "postgresql":
+        return not any("Seq Scan on logs" in line for line in plan)
+    if dialect.startswith("mysql"):
+        return not any("'key': None" in line and "'table': 'logs'" in line for line in plan)
+    raise ValueError(f"Query plan checks are not supported for {dialect}")
+
+
+def check_query_plans(engine: Engine) -> Dict[str, dict]:
+    report = {}
+    for endpoint, statement in endpoint_queries(engine).items():
+        plan = explain(engine, statement)
+        report[endpoint] = {"uses_index": uses_index(engine, plan), "plan": plan}
+    return report
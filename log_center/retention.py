@@ -0,0 +1,273 @@
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, NamedTuple, Optional
+
+from sqlalchemy import and_, delete, or_, select, true
+from sqlalchemy.orm import Session
+
+from .models import LEVEL_CODES, LogEntry
+from .search import SearchTerm, message_matches, remove_log_rows
+
+
+class RetentionRule(NamedTuple):
+    process_name: Optional[str]  # None matches every process
+    level: Optional[str]  # None matches every level
+    days: float
+
+
+class RetentionPolicy:
+    # rules look like "DEBUG=3,ERROR=90,*=30,billing/*=365,billing/DEBUG=7", ages in days;
+    # the most specific rule wins: process and level, then process, then level, then *
+    def __init__(self, rules: List[RetentionRule]):
+        self.rules = rules
+
+    @classmethod
+    def parse(cls, spec: Optional[str]) -> "RetentionPolicy":
+        rules = []
+        for part in (spec or "").split(","):
+            if not part.strip():
+                continue
+            selector, sep, days = part.partition("=")
+            if not sep:
+                raise ValueError(f"Invalid retention rule, expected selector=days: {part}")
+            process_name, _, level = selector.strip().rpartition("/")
+            level = level.strip().upper()
+            if level != "*" and level not in LEVEL_CODES:
+                raise ValueError(f"Invalid retention rule, expected a level or *: {part}")
+            rules.append(RetentionRule(
+                process_name.strip() or None,
+                None if level == "*" else level,
+                float(days),
+            ))
+        return cls(rules)
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def conditions(self, rule: RetentionRule):
+        # the rows a rule is responsible for: its selector minus the rows a more specific rule covers. a process
+        # only leaves the level and * rules for the levels it has rules of its own for, unless it has a process/* rule
+        whole_processes = {other.process_name for other in self.rules if other.process_name is not None and other.level is None}
+        process_levels = {}
+        for other in self.rules:
+            if other.process_name is not None and other.level is not None:
+                process_levels.setdefault(other.level, set()).add(other.process_name)
+
+        criteria = []
+        if rule.process_name is not None:
+            criteria.append(LogEntry.process_name == rule.process_name)
+            if rule.level is None:
+                levels = [level for level, processes in process_levels.items() if rule.process_name in processes]
+                criteria.append(_not_in(LogEntry.level, levels))
+        elif rule.level is not None:
+            criteria.append(_not_in(LogEntry.process_name, whole_processes | process_levels.get(rule.level, set())))
+        else:
+            criteria.append(_not_in(LogEntry.process_name, whole_processes))
+            levels = {other.level for other in self.rules if other.process_name is None and other.level is not None}
+            criteria.append(_not_in(LogEntry.level, levels))
+            for level, processes in sorted(process_levels.items()):
+                if level not in levels:
+                    criteria.append(or_(_not_in(LogEntry.level, [level]), _not_in(LogEntry.process_name, processes)))
+        if rule.level is not None:
+            criteria.append(LogEntry.level == rule.level)
+        return and_(*criteria)
+
+
+def _not_in(column, values):
+    if not values:
+        return true()
+    return or_(column.is_(None), column.notin_(sorted(values)))
+
+
+def _archive_row(row) -> dict:
+    return {
+        "id": row.id,
+        "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+        "level": row.level,
+        "process_name": row.process_name,
+        "message": row.message,
+    }
+
+
+class LogArchive:
+    # gzip NDJSON files partitioned by day: <directory>/YYYY/MM/DD/<first log id>.ndjson.gz
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def write(self, rows: List[dict]):
+        by_day = {}
+        for row in rows:
+            day = datetime.fromisoformat(row["timestamp"]).date() if row["timestamp"] else date.min
+            by_day.setdefault(day, []).append(row)
+        for day, day_rows in by_day.items():
+            directory = self._day_directory(day)
+            os.makedirs(directory, exist_ok=True)
+            # named after the first id so re-archiving a batch after a crash overwrites instead of duplicating
+            path = os.path.join(directory, f"{day_rows[0]['id']}.ndjson.gz")
+            with gzip.open(path + ".tmp", "wt", encoding="utf-8") as file:
+                for row in day_rows:
+                    file.write(json.dumps(row) + "\n")
+            with open(path + ".tmp", "rb") as file:
+                os.fsync(file.fileno())
+            os.replace(path + ".tmp", path)
+
+    def read(self, start: Optional[datetime] = None, end: Optional[datetime] = None, level: Optional[str] = None,
+             process_name: Optional[str] = None, terms: Optional[List[SearchTerm]] = None) -> Iterator[dict]:
+        # only the day partitions overlapping [start, end] are opened
+        for day in self._days():
+            if (start and day < start.date()) or (end and day > end.date()):
+                continue
+            directory = self._day_directory(day)
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith(".ndjson.gz"):
+                    continue
+                with gzip.open(os.path.join(directory, name), "rt", encoding="utf-8") as file:
+                    for line in file:
+                        row = json.loads(line)
+                        timestamp = datetime.fromisoformat(row["timestamp"]) if row["timestamp"] else None
+                        if start and (timestamp is None or timestamp < start):
+                            continue
+                        if end and (timestamp is None or timestamp > end):
+                            continue
+                        if level and row["level"] != level:
+                            continue
+                        if process_name and row["process_name"] != process_name:
+                            continue
+                        if terms and not message_matches(terms, row["message"]):
+                            continue
+                        yield row
+
+    def _days(self) -> List[date]:
+        days = []
+        if not os.path.isdir(self.directory):
+            return days
+        for year in os.listdir(self.directory):
+            for month in os.listdir(os.path.join(self.directory, year)):
+                for day in os.listdir(os.path.join(self.directory, year, month)):
+                    try:
+                        days.append(date(int(year), int(month), int(day)))
+                    except ValueError:
+                        continue
+        return sorted(days)
+
+    def _day_directory(self, day: date) -> str:
+        return os.path.join(self.directory, f"{day.year:04d}", f"{day.month:02d}", f"{day.day:02d}")
+
+
+class RetentionScheduler:
+    def __init__(self, session_factory, policy: RetentionPolicy, archive: Optional[LogArchive] = None,
+                 interval: float = 3600.0, batch_size: int = 1000, pause: float = 0.05):
+        self.session_factory = session_factory
+        self.policy = policy
+        self.archive = archive
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.deleted = 0
+        self.archived = 0
+        self.last_run_at = None
+        self.last_run_seconds = None
+        self.last_error = None
+
+    def start(self):
+        if not self.policy or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="LogCenterRetention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30.0):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join(timeout)
+
+    def purge(self) -> int:
+        # deletes expired rows rule by rule in small batches, each its own short transaction
+        started = time.perf_counter()
+        now = datetime.now()
+        total = 0
+        for rule in self.policy.rules:
+            statement = (
+                select(LogEntry)
+                .where(self.policy.conditions(rule), LogEntry.timestamp < now - timedelta(days=rule.days))
+                .order_by(LogEntry.timestamp, LogEntry.id)
+                .limit(self.batch_size)
+            )
+            while not self._stop.is_set():
+                deleted = self._purge_batch(statement)
+                total += deleted
+                if deleted < self.batch_size:
+                    break
+                # gives concurrent writers a chance at the locks between batches
+                self._stop.wait(self.pause)
+
+        with self._lock:
+            self.runs += 1
+            self.last_run_at = now
+            self.last_run_seconds = time.perf_counter() - started
+        return total
+
+    def _purge_batch(self, statement) -> int:
+        # the archive is gzipped and fsynced between two short transactions, so the writer connection (the only
+        # one with LOG_CENTER_SQLITE_WRITER) is free for ingest meanwhile; rows archived but not yet deleted
+        # are archived again by the next run, to the same file
+        db: Session = self.session_factory()
+        try:
+            rows = db.scalars(statement).all()
+            ids = [row.id for row in rows]
+            archive_rows = [_archive_row(row) for row in rows] if self.archive is not None else None
+        finally:
+            db.close()
+        if not ids:
+            return 0
+        if archive_rows is not None:
+            self.archive.write(archive_rows)
+
+        db = self.session_factory()
+        try:
+            remove_log_rows(db, ids)
+            db.execute(delete(LogEntry).where(LogEntry.id.in_(ids)).execution_options(synchronize_session=False))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        with self._lock:
+            self.deleted += len(ids)
+            if self.archive is not None:
+                self.archived += len(ids)
+        return len(ids)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": bool(self.policy),
+                "rules": [rule._asdict() for rule in self.policy.rules],
+                "archive": self.archive.directory if self.archive else None,
+                "runs": self.runs,
+                "deleted": self.deleted,
+                "archived": self.archived,
+                "last_run_at": self.last_run_at,
+                "last_run_seconds": self.last_run_seconds,
+                "last_error": self.last_error,
+            }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.purge()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            self._stop.wait(self.interval)
@@ -0,0 +1,219 @@
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .models import LogEntry, LogRollup
+
+MINUTE = "minute"
+HOUR = "hour"
+DAY = "day"
+# finest first
+BUCKETS = [MINUTE, HOUR, DAY]
+GROUP_BY_COLUMNS = ["process_name", "level"]
+
+
+def bucket_start(timestamp: datetime, bucket: str) -> datetime:
+    if bucket == MINUTE:
+        return timestamp.replace(second=0, microsecond=0)
+    if bucket == HOUR:
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if bucket == DAY:
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown bucket size: {bucket}")
+
+
+def rollup_counts(rows: Iterable) -> Counter:
+    counts = Counter()
+    for row in rows:
+        timestamp, process_name, level = _fields(row)
+        for bucket in BUCKETS:
+            counts[(bucket, bucket_start(timestamp, bucket), process_name or "", level or "")] += 1
+    return counts
+
+
+def _fields(row):
+    if isinstance(row, dict):
+        return row.get("timestamp") or datetime.now(), row.get("process_name"), row.get("level")
+    return row.timestamp or datetime.now(), row.process_name, row.level
+
+
+def _rollup_params(counts: Counter) -> List[dict]:
+    # sorted so concurrent writers lock rollup rows in the same order
+    return [
+        {"bucket": bucket, "bucket_start": start, "process_name": process_name, "level": level, "count": count}
+        for (bucket, start, process_name, level), count in sorted(counts.items())
+    ]
+
+
+def update_rollups(db: Session, rows: List[dict]):
+    # adds the rows to their minute, hour and day counters in the caller's transaction
+    add_rollup_counts(db, rollup_counts(rows))
+
+
+def add_rollup_counts(db: Session, counts: Counter):
+    params = _rollup_params(counts)
+    if not params:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(LogRollup)
+        statement = statement.on_conflict_do_update(
+            index_elements=[LogRollup.bucket, LogRollup.bucket_start, LogRollup.process_name, LogRollup.level],
+            set_={"count": LogRollup.count + statement.excluded["count"]},
+        )
+        db.execute(statement, params)
+    elif dialect.startswith("mysql"):
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        statement = mysql_insert(LogRollup)
+        db.execute(statement.on_duplicate_key_update(count=LogRollup.count + statement.inserted["count"]), params)
+    else:
+        for param in params:
+            updated = db.execute(
+                update(LogRollup)
+                .where(LogRollup.bucket == param["bucket"], LogRollup.bucket_start == param["bucket_start"],
+                       LogRollup.process_name == param["process_name"], LogRollup.level == param["level"])
+                .values(count=LogRollup.count + param["count"])
+                .execution_options(synchronize_session=False)
+            )
+            if updated.rowcount == 0:
+                db.execute(insert(LogRollup), [param])
+
+
+class RollupBuffer:
+    # counts of committed rows, added to log_rollups by a background thread every interval seconds in a transaction
+    # of its own, so ingest transactions never wait on the hot rollup rows. counts not yet flushed are lost if the
+    # process dies, and rebuild_rollups cannot bring back those of logs retention has purged since
+    def __init__(self, session_factory: Callable[[], Session], interval: float = 1.0):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.flushes = 0
+        self.last_error = None
+
+    def add(self, rows: List[dict]):
+        counts = rollup_counts(rows)
+        with self._lock:
+            self._counts.update(counts)
+        self._ensure_started()
+
+    def flush(self) -> int:
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return 0
+        db = self.session_factory()
+        try:
+            add_rollup_counts(db, counts)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # kept for the next flush
+            with self._lock:
+                self._counts.update(counts)
+            raise
+        finally:
+            db.close()
+        with self._lock:
+            self.flushes += 1
+        return len(counts)
+
+    def stop(self, timeout: float = 30.0):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "interval": self.interval,
+                "pending": len(self._counts),
+                "flushes": self.flushes,
+                "last_error": self.last_error,
+            }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="LogCenterRollups", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+
+
+def rebuild_rollups(engine: Engine, chunk_size: int = 10000) -> int:
+    # recomputes every rollup from the logs table, for existing databases and after manual edits to logs. counts of
+    # logs retention has purged are lost; rows ingested while this runs are counted twice or not at all, so run it
+    # with ingest stopped
+    counts = Counter()
+    with Session(engine) as db:
+        result = db.execute(
+            select(LogEntry.timestamp, LogEntry.process_name, LogEntry.level).execution_options(yield_per=chunk_size)
+        )
+        for rows in result.partitions():
+            counts.update(rollup_counts(rows))
+
+        db.execute(delete(LogRollup))
+        params = _rollup_params(counts)
+        for start in range(0, len(params), chunk_size):
+            db.execute(insert(LogRollup), params[start:start + chunk_size])
+        db.commit()
+    return len(params)
+
+
+def _aligned(value: Optional[datetime], bucket: str) -> bool:
+    return value is None or bucket_start(value, bucket) == value
+
+
+def stats_query(bucket: Optional[str] = None, group_by: Optional[List[str]] = None, start: Optional[datetime] = None,
+                end: Optional[datetime] = None, process_name: Optional[str] = None, level: Optional[str] = None):
+    # counts logs in [start, end) from the rollups; without a bucket size the coarsest rollup that
+    # lines up with start and end is summed, e.g. day rollups for a month
+    group_by = group_by or []
+    for name in group_by:
+        if name not in GROUP_BY_COLUMNS:
+            raise ValueError(f"Cannot group by {name}, expected one of {', '.join(GROUP_BY_COLUMNS)}")
+    if bucket is not None and bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket size: {bucket}")
+
+    source = bucket or next((size for size in reversed(BUCKETS) if _aligned(start, size) and _aligned(end, size)), MINUTE)
+    columns = [LogRollup.bucket_start] if bucket else []
+    columns += [getattr(LogRollup, name) for name in group_by]
+
+    statement = select(*columns, func.coalesce(func.sum(LogRollup.count), 0).label("count")).where(LogRollup.bucket == source)
+    if start is not None:
+        statement = statement.where(LogRollup.bucket_start >= bucket_start(start, source))
+    if end is not None:
+        statement = statement.where(LogRollup.bucket_start < end)
+    if process_name is not None:
+        statement = statement.where(LogRollup.process_name == process_name)
+    if level is not None:
+        statement = statement.where(LogRollup.level == level)
+    if columns:
+        statement = statement.group_by(*columns).order_by(*columns)
+    return statement
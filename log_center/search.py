@@ -0,0 +1,199 @@
+import re
+from typing import List, NamedTuple
+
+from sqlalchemy import and_, column, delete, func, inspect, literal_column, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .models import LogEntry, LogToken, insert_ignoring_duplicates
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+FTS5 = "fts5"
+POSTGRES = "postgres"
+TOKENS = "tokens"
+LIKE = "like"
+
+logs_fts = table("logs_fts", column("rowid"), column("rank"))
+logs_rowid = literal_column("logs.rowid")
+message_tsvector = func.to_tsvector(literal_column("'simple'::regconfig"), LogEntry.message)
+
+_backends = {}
+
+
+class SearchTerm(NamedTuple):
+    kind: str  # "word", "prefix" or "phrase"
+    tokens: List[str]
+    raw: str
+
+
+def tokenize(text_value: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text_value.lower())
+
+
+def parse_search(keyword: str) -> List[SearchTerm]:
+    # terms are ANDed together: plain words, "quoted phrases" and prefix* matches
+    terms = []
+    for phrase, word in QUERY_PATTERN.findall(keyword):
+        if phrase:
+            tokens = tokenize(phrase)
+            if tokens:
+                terms.append(SearchTerm("phrase" if len(tokens) > 1 else "word", tokens, phrase))
+            continue
+        tokens = tokenize(word)
+        terms.extend(SearchTerm("word", [token], token) for token in tokens)
+        if tokens and word.endswith("*"):
+            terms[-1] = SearchTerm("prefix", [tokens[-1]], tokens[-1])
+    if not terms:
+        raise ValueError(f"Search query contains no searchable terms: {keyword}")
+    return terms
+
+
+def message_matches(terms: List[SearchTerm], message: str) -> bool:
+    # evaluates a parsed query against one message in memory, with the same semantics as the indexed search
+    tokens = tokenize(message or "")
+    for term in terms:
+        if term.kind == "prefix":
+            if not any(token.startswith(term.tokens[0]) for token in tokens):
+                return False
+        elif term.kind == "phrase":
+            size = len(term.tokens)
+            if not any(tokens[start:start + size] == term.tokens for start in range(len(tokens) - size + 1)):
+                return False
+        elif term.tokens[0] not in tokens:
+            return False
+    return True
+
+
+def search_backend(engine: Engine) -> str:
+    if engine not in _backends:
+        inspector = inspect(engine)
+        if engine.dialect.name == "sqlite" and inspector.has_table("logs_fts"):
+            _backends[engine] = FTS5
+        elif engine.dialect.name == "postgresql" and any(index["name"] == "ix_logs_message_fts" for index in inspector.get_indexes("logs")):
+            _backends[engine] = POSTGRES
+        elif engine.dialect.name not in ("sqlite", "postgresql") and inspector.has_table(LogToken.__tablename__):
+            _backends[engine] = TOKENS
+        else:
+            # no text index has been built yet, fall back to substring matching
+            _backends[engine] = LIKE
+    return _backends[engine]
+
+
+def ensure_search_index(engine: Engine):
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            exists = inspect(conn).has_table("logs_fts")
+            conn.exec_driver_sql("CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(message, content='logs', content_rowid='rowid')")
+            conn.exec_driver_sql("CREATE TRIGGER IF NOT EXISTS logs_fts_insert AFTER INSERT ON logs BEGIN "
+                                 "INSERT INTO logs_fts(rowid, message) VALUES (new.rowid, new.message); END")
+            conn.exec_driver_sql("CREATE TRIGGER IF NOT EXISTS logs_fts_delete AFTER DELETE ON logs BEGIN "
+                                 "INSERT INTO logs_fts(logs_fts, rowid, message) VALUES ('delete', old.rowid, old.message); END")
+            conn.exec_driver_sql("CREATE TRIGGER IF NOT EXISTS logs_fts_update AFTER UPDATE OF message ON logs BEGIN "
+                                 "INSERT INTO logs_fts(logs_fts, rowid, message) VALUES ('delete', old.rowid, old.message); "
+                                 "INSERT INTO logs_fts(rowid, message) VALUES (new.rowid, new.message); END")
+            if not exists:
+                conn.exec_driver_sql("INSERT INTO logs_fts(logs_fts) VALUES ('rebuild')")
+    elif engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_logs_message_fts ON logs USING GIN (to_tsvector('simple'::regconfig, message))")
+    else:
+        rebuild_token_index(engine)
+    _backends.pop(engine, None)
+
+
+def rebuild_token_index(engine: Engine, batch_size: int = 5000):
+    with Session(engine) as db:
+        db.execute(delete(LogToken))
+        last_id = ""
+        while True:
+            rows = db.execute(
+                select(LogEntry.id, LogEntry.message).where(LogEntry.id > last_id).order_by(LogEntry.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            _insert_tokens(db, [{"id": row.id, "message": row.message} for row in rows])
+            db.commit()
+            last_id = rows[-1].id
+
+
+def _insert_tokens(db: Session, rows: List[dict]):
+    tokens = [
+        {"token": token, "log_id": row["id"]}
+        for row in rows
+        for token in set(tokenize(row["message"] or ""))
+    ]
+    if tokens:
+        db.execute(insert_ignoring_duplicates(db, LogToken), tokens)
+
+
+def index_log_rows(db: Session, rows: List[dict]):
+    # FTS5 triggers and the Postgres expression index follow inserts on their own, only the token table needs feeding
+    if search_backend(db.get_bind()) == TOKENS:
+        _insert_tokens(db, rows)
+
+
+def remove_log_rows(db: Session, log_ids: List[str]):
+    if search_backend(db.get_bind()) == TOKENS:
+        db.execute(delete(LogToken).where(LogToken.log_id.in_(log_ids)))
+
+
+def _fts5_query(terms: List[SearchTerm]) -> str:
+    parts = []
+    for term in terms:
+        quoted = '"' + " ".join(term.tokens) + '"'
+        parts.append(quoted + "*" if term.kind == "prefix" else quoted)
+    return " AND ".join(parts)
+
+
+def _fts5_match(terms: List[SearchTerm]):
+    return text("logs_fts MATCH :fts_query").bindparams(fts_query=_fts5_query(terms))
+
+
+def _tsquery(terms: List[SearchTerm]) -> str:
+    parts = []
+    for term in terms:
+        if term.kind == "phrase":
+            parts.append("(" + " <-> ".join(term.tokens) + ")")
+        elif term.kind == "prefix":
+            parts.append(term.tokens[0] + ":*")
+        else:
+            parts.append(term.tokens[0])
+    return " & ".join(parts)
+
+
+def search_filter(db: Session, keyword: str):
+    terms = parse_search(keyword)
+    backend = search_backend(db.get_bind())
+
+    if backend == FTS5:
+        return logs_rowid.in_(select(logs_fts.c.rowid).where(_fts5_match(terms)))
+
+    if backend == POSTGRES:
+        return message_tsvector.op("@@")(func.to_tsquery(literal_column("'simple'::regconfig"), _tsquery(terms)))
+
+    criteria = []
+    for term in terms:
+        if backend == TOKENS:
+            for token in term.tokens:
+                match = LogToken.token.like(token + "%") if term.kind == "prefix" else LogToken.token == token
+                criteria.append(LogEntry.id.in_(select(LogToken.log_id).where(match)))
+            if term.kind == "phrase":
+                criteria.append(func.lower(LogEntry.message).contains(term.raw.lower(), autoescape=True))
+        else:
+            criteria.append(func.lower(LogEntry.message).contains(term.raw.lower(), autoescape=True))
+    return and_(*criteria)
+
+
+def ranked(query, db: Session, keyword: str):
+    # orders a search query by relevance; the token and LIKE fallbacks have no relevance score and use recency instead
+    backend = search_backend(db.get_bind())
+    if backend == FTS5:
+        query = query.join(logs_fts, logs_fts.c.rowid == logs_rowid).filter(_fts5_match(parse_search(keyword)))
+        return query.order_by(logs_fts.c.rank)
+    query = query.filter(search_filter(db, keyword))
+    if backend == POSTGRES:
+        tsquery = func.to_tsquery(literal_column("'simple'::regconfig"), _tsquery(parse_search(keyword)))
+        return query.order_by(func.ts_rank(message_tsvector, tsquery).desc())
+    return query.order_by(LogEntry.timestamp.desc(), LogEntry.id.desc())
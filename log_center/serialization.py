@@ -0,0 +1,58 @@
+import json
+from datetime import datetime
+from typing import Iterable
+
+from fastapi import Response
+from sqlalchemy.orm import Query, Session
+
+from .metrics import ROWS_RETURNED
+from .models import LogEntry, Process
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# same fields and order as LogEntryCreate, selected as plain tuples so no ORM objects are built
+LOG_COLUMNS = (LogEntry.id, LogEntry.level, LogEntry.message, Process.name.label("process_name"), LogEntry.timestamp)
+LOG_FIELDS = ("id", "level", "message", "process_name", "timestamp")
+
+
+def log_rows(db: Session) -> Query:
+    return db.query(*LOG_COLUMNS).outerjoin(Process, Process.id == LogEntry.process_id)
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value) -> bytes:
+    # orjson when installed (pip install orjson); both produce the same JSON for log rows
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), default=_default).encode()
+
+
+def loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def log_dicts(rows: Iterable) -> list:
+    return [dict(zip(LOG_FIELDS, row)) for row in rows]
+
+
+class LogRowsResponse(Response):
+    # returned directly, so FastAPI skips validating every row against the route's response_model
+    media_type = "application/json"
+
+    def __init__(self, rows: Iterable, response: Response = None):
+        headers = None
+        if response is not None and "X-Next-Cursor" in response.headers:
+            headers = {"X-Next-Cursor": response.headers["X-Next-Cursor"]}
+        rows = log_dicts(rows)
+        ROWS_RETURNED.inc("page", amount=len(rows))
+        super().__init__(content=dumps(rows), headers=headers)
@@ -0,0 +1,173 @@
+import json
+import os
+import re
+import struct
+import threading
+from typing import List, NamedTuple, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+LENGTH_PREFIX = struct.Struct(">I")
+SEGMENT_PATTERN = re.compile(r"^segment-(\d{12})\.log$")
+CHECKPOINT_FILE = "checkpoint.json"
+LOCK_FILE = "spool.lock"
+
+
+class SpoolLocked(Exception):
+    pass
+
+
+class SpoolPosition(NamedTuple):
+    segment: int
+    offset: int
+
+
+def encode_record(record: dict) -> bytes:
+    payload = json.dumps(record, separators=(",", ":")).encode()
+    return LENGTH_PREFIX.pack(len(payload)) + payload
+
+
+def decode_records(data: bytes, max_records: Optional[int] = None) -> Tuple[List[dict], int]:
+    # returns the complete records in data and how many bytes they used; a trailing partial record is left alone
+    records = []
+    offset = 0
+    while offset + LENGTH_PREFIX.size <= len(data) and (max_records is None or len(records) < max_records):
+        (length,) = LENGTH_PREFIX.unpack_from(data, offset)
+        end = offset + LENGTH_PREFIX.size + length
+        if end > len(data):
+            break
+        records.append(json.loads(data[offset + LENGTH_PREFIX.size:end]))
+        offset = end
+    return records, offset
+
+
+class LogSpool:
+    # append-only, length-prefixed segment files with a committed-offset checkpoint
+    def __init__(self, directory: str, max_segment_bytes: int = 16 * 1024 * 1024, fsync: bool = False):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # one owner per directory: a second spool would append next to us and its commit() would delete our segment
+        self._lock_file = _lock_directory(directory)
+        segments = self._segments()
+        # always start a fresh segment, so a record torn by a crash can only ever sit at the end of a closed one
+        self._active = segments[-1] + 1 if segments else 0
+        self._active_file = None
+
+    def append(self, records: List[dict]):
+        data = b"".join(encode_record(record) for record in records)
+        with self._lock:
+            if self._active_file is None:
+                self._active_file = open(self._segment_path(self._active), "ab")
+            elif self._active_file.tell() > 0 and self._active_file.tell() + len(data) > self.max_segment_bytes:
+                self._active_file.close()
+                self._active += 1
+                self._active_file = open(self._segment_path(self._active), "ab")
+            self._active_file.write(data)
+            self._active_file.flush()
+            if self.fsync:
+                os.fsync(self._active_file.fileno())
+
+    def read_batch(self, max_records: int = 500, max_bytes: int = 4 * 1024 * 1024) -> Tuple[List[dict], SpoolPosition]:
+        # reads at most max_records/max_bytes past the checkpoint, so replaying a huge backlog stays memory bounded
+        position = self.checkpoint()
+        records = []
+        for segment in self._segments():
+            if segment < position.segment:
+                continue
+            offset = position.offset if segment == position.segment else 0
+            with open(self._segment_path(segment), "rb") as file:
+                file.seek(offset)
+                data = file.read(max_bytes)
+                if len(data) >= LENGTH_PREFIX.size:
+                    # a single record larger than max_bytes is still read whole
+                    (length,) = LENGTH_PREFIX.unpack_from(data)
+                    if LENGTH_PREFIX.size + length > len(data):
+                        data += file.read(LENGTH_PREFIX.size + length - len(data))
+            decoded, used = decode_records(data, max_records - len(records))
+            records.extend(decoded)
+            position = SpoolPosition(segment, offset + used)
+            reached_end = len(data) < max_bytes and (used == len(data) or not decoded)
+            if len(records) >= max_records or not reached_end or segment >= self._active:
+                break
+            # whatever is left in a closed segment is a record torn by a crash
+            position = SpoolPosition(segment + 1, 0)
+        return records, position
+
+    def commit(self, position: SpoolPosition):
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        with open(path + ".tmp", "w") as file:
+            json.dump(position._asdict(), file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + ".tmp", path)
+        # segments before the checkpoint have been fully replayed
+        for segment in self._segments():
+            if segment < position.segment:
+                os.remove(self._segment_path(segment))
+
+    def checkpoint(self) -> SpoolPosition:
+        try:
+            with open(os.path.join(self.directory, CHECKPOINT_FILE)) as file:
+                return SpoolPosition(**json.load(file))
+        except (OSError, ValueError):
+            segments = self._segments()
+            return SpoolPosition(segments[0] if segments else 0, 0)
+
+    def pending_bytes(self) -> int:
+        position = self.checkpoint()
+        total = 0
+        for segment in self._segments():
+            if segment >= position.segment:
+                size = os.path.getsize(self._segment_path(segment))
+                total += size - position.offset if segment == position.segment else size
+        return max(total, 0)
+
+    def close(self):
+        with self._lock:
+            if self._active_file is not None:
+                self._active_file.close()
+                self._active_file = None
+            if self._lock_file is not None:
+                self._lock_file.close()  # closing the file releases the lock
+                self._lock_file = None
+
+    def _segments(self) -> List[int]:
+        return sorted(int(match.group(1)) for match in map(SEGMENT_PATTERN.match, os.listdir(self.directory)) if match)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment:012d}.log")
+
+
+def _lock_directory(directory: str):
+    lock_file = open(os.path.join(directory, LOCK_FILE), "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        elif msvcrt is not None:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.close()
+        raise SpoolLocked(f"Spool directory {directory} is in use by another writer")
+    return lock_file
+
+
+def claim_spool(directory: str, max_writers: int = 64) -> LogSpool:
+    # the first writer gets the directory itself, writers that find it locked take writer-1, writer-2, ... below it;
+    # a restarted process claims the same slots again and replays what its predecessors left
+    for index in range(max_writers):
+        try:
+            return LogSpool(directory if index == 0 else os.path.join(directory, f"writer-{index}"))
+        except SpoolLocked:
+            continue
+    raise SpoolLocked(f"All {max_writers} spool slots under {directory} are in use")
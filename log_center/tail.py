@@ -0,0 +1,140 @@
+import asyncio
+import json
+import os
+import threading
+from typing import AsyncIterator, List, Optional
+
+from .search import SearchTerm, message_matches, parse_search
+
+
+class TailFilter:
+    def __init__(self, process_name: Optional[str] = None, level: Optional[str] = None, keyword: Optional[str] = None):
+        self.process_name = process_name
+        self.level = level
+        # parsed once per subscriber, raises ValueError for queries without searchable terms
+        self.terms: Optional[List[SearchTerm]] = parse_search(keyword) if keyword else None
+
+    def matches(self, row: dict) -> bool:
+        if self.process_name is not None and row.get("process_name") != self.process_name:
+            return False
+        if self.level is not None and row.get("level") != self.level:
+            return False
+        return self.terms is None or message_matches(self.terms, row.get("message"))
+
+
+class TailSubscription:
+    def __init__(self, broker: "TailBroker", tail_filter: TailFilter, loop: asyncio.AbstractEventLoop, buffer_size: int):
+        self.broker = broker
+        self.filter = tail_filter
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=buffer_size)
+        self.dropped = 0
+
+    def _offer(self, events: List[str]):
+        # runs on the subscriber's event loop; a consumer that cannot keep up loses records instead of holding up ingest
+        for event in events:
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self.broker._count_dropped(1)
+
+    async def events(self, heartbeat: float) -> AsyncIterator[str]:
+        # yields server-sent events, with a comment line whenever the stream has been idle for heartbeat seconds
+        while True:
+            try:
+                event = await asyncio.wait_for(self.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                yield f"event: dropped\ndata: {json.dumps({'dropped': dropped})}\n\n"
+            yield event
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+def _event(row: dict) -> str:
+    timestamp = row.get("timestamp")
+    data = {
+        "id": row.get("id"),
+        "level": row.get("level"),
+        "message": row.get("message"),
+        "process_name": row.get("process_name"),
+        "timestamp": timestamp.isoformat() if timestamp is not None else None,
+    }
+    return f"id: {data['id']}\ndata: {json.dumps(data)}\n\n"
+
+
+class TailBroker:
+    # in-process fan-out of committed logs to live tail subscribers; each worker process only sees its own ingests
+    def __init__(self, buffer_size: int = 1000, max_subscribers: int = 100):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: List[TailSubscription] = []
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, tail_filter: TailFilter) -> Optional[TailSubscription]:
+        # must be called from the event loop that will consume the subscription; None when the broker is full
+        subscription = TailSubscription(self, tail_filter, asyncio.get_running_loop(), self.buffer_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers = self._subscribers + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: TailSubscription):
+        with self._lock:
+            self._subscribers = [existing for existing in self._subscribers if existing is not subscription]
+
+    def publish(self, rows: List[dict]):
+        # called from ingest threads after commit; each record is serialized at most once however many subscribers match
+        subscribers = self._subscribers
+        if not subscribers or not rows:
+            return
+        events = {}
+        delivered = 0
+        for subscription in subscribers:
+            matched = []
+            for index, row in enumerate(rows):
+                if subscription.filter.matches(row):
+                    if index not in events:
+                        events[index] = _event(row)
+                    matched.append(events[index])
+            if matched:
+                delivered += len(matched)
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription._offer, matched)
+                except RuntimeError:
+                    # the subscriber's loop has shut down
+                    self.unsubscribe(subscription)
+        with self._lock:
+            self.published += len(rows)
+            self.delivered += delivered
+
+    def _count_dropped(self, count: int):
+        with self._lock:
+            self.dropped += count
+            self.delivered -= count
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "max_subscribers": self.max_subscribers,
+                "buffer_size": self.buffer_size,
+                "published": self.published,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+            }
+
+
+tail_broker = TailBroker(
+    buffer_size=int(os.getenv("LOG_CENTER_TAIL_BUFFER", 1000)),
+    max_subscribers=int(os.getenv("LOG_CENTER_TAIL_MAX_SUBSCRIBERS", 100)),
+)
@@ -0,0 +1,71 @@
+import os
+import random
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# defaults for the process-wide transport shared by LogWriter, LogQuery and LogAdmin
+POOL_SIZE = int(os.getenv("LOG_CENTER_HTTP_POOL_SIZE", "10"))
+CONNECT_TIMEOUT = float(os.getenv("LOG_CENTER_HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("LOG_CENTER_HTTP_READ_TIMEOUT", "30"))
+
+
+class HTTPTransport:
+    # one keep-alive connection pool per host; requests.Session is safe to share between threads as long as
+    # nobody mutates its headers or adapters after construction, which this class never does
+    def __init__(self, pool_size: int = POOL_SIZE, connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 pool_block: bool = False):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        # retries are done by the clients, which know whether a request is safe to repeat
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0, pool_block=pool_block)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_default = None
+_default_pid = None
+_default_lock = threading.Lock()
+
+
+def default_transport() -> HTTPTransport:
+    # a forked child gets its own pool instead of sharing the parent's sockets
+    global _default, _default_pid
+    with _default_lock:
+        if _default is None or _default_pid != os.getpid():
+            _default, _default_pid = HTTPTransport(), os.getpid()
+        return _default
+
+
+def backoff_delay(attempt: int, base: float, cap: float, response: Optional[requests.Response] = None) -> float:
+    # "full jitter": uniform between 0 and the exponential step, so clients that failed together don't retry together
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            delay = max(delay, min(cap, float(retry_after)))
+        except ValueError:
+            pass  # an HTTP date, which the API never sends
+    return delay
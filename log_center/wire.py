@@ -0,0 +1,246 @@
+import struct
+import zlib
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from .ids import ULID_PATTERN
+from .models import LEVEL_CODES, LEVEL_NAMES
+from .serialization import dumps, loads
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# request body formats accepted by POST /logs/batch, besides a plain JSON array
+JSON = "application/json"
+MSGPACK = "application/x-msgpack"
+RECORDS = "application/x-log-center-records"
+FORMATS = {"json": JSON, "msgpack": MSGPACK, "records": RECORDS}
+
+IDENTITY = "identity"
+GZIP = "gzip"
+ZSTD = "zstd"
+
+# msgpack records may be arrays in this order instead of maps, so key names are not repeated on every record
+WIRE_FIELDS = ("id", "level", "message", "process_name", "timestamp")
+
+# length-prefixed records: level code, id length, timestamp, process name length, message length, then the three strings.
+# timestamps are wall-clock microseconds since 1970-01-01 with no timezone, the same naive value the JSON path stores
+RECORDS_MAGIC = b"LCR1"
+RECORD_HEADER = struct.Struct(">BBqHI")
+NO_TIMESTAMP = -(2 ** 63)
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class UnsupportedWireFormat(Exception):
+    pass
+
+
+class PayloadTooLarge(Exception):
+    pass
+
+
+def content_types() -> List[str]:
+    return [JSON, RECORDS] + ([MSGPACK] if msgpack is not None else [])
+
+
+def content_encodings() -> List[str]:
+    return [IDENTITY, GZIP] + ([ZSTD] if zstandard is not None else [])
+
+
+def _micros(value) -> int:
+    if value is None:
+        return NO_TIMESTAMP
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        raise ValueError("Binary log records only carry naive timestamps")
+    return (value - EPOCH) // MICROSECOND
+
+
+def _timestamp(micros: int) -> Optional[datetime]:
+    return None if micros == NO_TIMESTAMP else EPOCH + micros * MICROSECOND
+
+
+def encode_records(rows: List[dict]) -> bytes:
+    # raises ValueError for anything the format cannot carry, callers then send the batch as JSON instead
+    parts = [RECORDS_MAGIC]
+    for row in rows:
+        try:
+            log_id = (row.get("id") or "").encode("ascii")
+            process_name = row["process_name"].encode()
+            message = row["message"].encode()
+            parts.append(RECORD_HEADER.pack(
+                LEVEL_CODES[row["level"]], len(log_id), _micros(row.get("timestamp")), len(process_name), len(message),
+            ))
+        except (KeyError, AttributeError, TypeError, struct.error) as e:
+            raise ValueError(f"Log record cannot be encoded: {e}")
+        parts += [log_id, process_name, message]
+    return b"".join(parts)
+
+
+def decode_records(body: bytes) -> List[dict]:
+    if not body.startswith(RECORDS_MAGIC):
+        raise ValueError("Body is not a log record stream")
+    rows = []
+    offset = len(RECORDS_MAGIC)
+    while offset < len(body):
+        if offset + RECORD_HEADER.size > len(body):
+            raise ValueError("Truncated log record")
+        level, id_length, micros, process_length, message_length = RECORD_HEADER.unpack_from(body, offset)
+        offset += RECORD_HEADER.size
+        end = offset + id_length + process_length + message_length
+        if end > len(body):
+            raise ValueError("Truncated log record")
+        row = {
+            "level": LEVEL_NAMES.get(level, str(level)),
+            "process_name": body[offset + id_length:offset + id_length + process_length].decode(),
+            "message": body[offset + id_length + process_length:end].decode(),
+        }
+        if id_length:
+            row["id"] = body[offset:offset + id_length].decode("ascii")
+        timestamp = _timestamp(micros)
+        if timestamp is not None:
+            row["timestamp"] = timestamp
+        rows.append(row)
+        offset = end
+    return rows
+
+
+def encode_msgpack(rows: List[dict]) -> bytes:
+    try:
+        return msgpack.packb([
+            [row.get("id"), row.get("level"), row.get("message"), row.get("process_name"), _micros(row.get("timestamp"))]
+            for row in rows
+        ])
+    except TypeError as e:
+        raise ValueError(f"Log record cannot be encoded: {e}")
+
+
+def decode_msgpack(body: bytes) -> list:
+    try:
+        records = msgpack.unpackb(body)
+    except Exception as e:
+        raise ValueError(f"Invalid msgpack body: {e}")
+    if not isinstance(records, list):
+        raise ValueError("Body must be an array of log records")
+    decoded = []
+    for record in records:
+        if isinstance(record, list) and len(record) == len(WIRE_FIELDS):
+            record = {field: value for field, value in zip(WIRE_FIELDS, record) if value is not None}
+            if isinstance(record.get("timestamp"), int):
+                timestamp = _timestamp(record.pop("timestamp"))
+                if timestamp is not None:
+                    record["timestamp"] = timestamp
+        decoded.append(record)
+    return decoded
+
+
+def encode(rows: List[dict], content_type: str) -> bytes:
+    if content_type == RECORDS:
+        return encode_records(rows)
+    if content_type == MSGPACK and msgpack is not None:
+        return encode_msgpack(rows)
+    if content_type == JSON:
+        return dumps(rows)
+    raise UnsupportedWireFormat(f"Unsupported content type: {content_type}")
+
+
+def decode(body: bytes, content_type: Optional[str]) -> list:
+    content_type = (content_type or JSON).split(";")[0].strip().lower()
+    if content_type == RECORDS:
+        return decode_records(body)
+    if content_type == MSGPACK and msgpack is not None:
+        return decode_msgpack(body)
+    if content_type == JSON:
+        records = loads(body)
+        if not isinstance(records, list):
+            raise ValueError("Body must be an array of log records")
+        return records
+    raise UnsupportedWireFormat(f"Unsupported content type: {content_type}")
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == GZIP:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(body) + compressor.flush()
+    if encoding == ZSTD and zstandard is not None:
+        return zstandard.ZstdCompressor().compress(body)
+    if encoding == IDENTITY:
+        return body
+    raise UnsupportedWireFormat(f"Unsupported content encoding: {encoding}")
+
+
+def decompress(body: bytes, encoding: Optional[str], max_bytes: int) -> bytes:
+    # stops as soon as the output passes max_bytes, so a small compressed body cannot expand without bound
+    encoding = (encoding or IDENTITY).strip().lower()
+    if encoding == IDENTITY:
+        data = body
+    elif encoding in (GZIP, "x-gzip"):
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = decompressor.decompress(body, max_bytes + 1)
+        except zlib.error as e:
+            raise ValueError(f"Invalid gzip body: {e}")
+        if len(data) <= max_bytes and not decompressor.eof:
+            raise ValueError("Truncated gzip body")
+    elif encoding == ZSTD and zstandard is not None:
+        chunks = []
+        size = 0
+        try:
+            with zstandard.ZstdDecompressor().stream_reader(body) as reader:
+                while size <= max_bytes:
+                    chunk = reader.read(max_bytes + 1 - size)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    size += len(chunk)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Invalid zstd body: {e}")
+        data = b"".join(chunks)
+    else:
+        raise UnsupportedWireFormat(f"Unsupported content encoding: {encoding}")
+    if len(data) > max_bytes:
+        raise PayloadTooLarge(f"Decoded body exceeds the maximum of {max_bytes} bytes")
+    return data
+
+
+def decode_batch(body: bytes, content_type: Optional[str], content_encoding: Optional[str], max_bytes: int) -> list:
+    return decode(decompress(body, content_encoding, max_bytes), content_type)
+
+
+def decoded_log_row(raw) -> Optional[dict]:
+    # the common well-formed record checked by hand; anything else returns None so the caller
+    # can validate it against LogEntryCreate, which accepts the edge cases and produces the error text
+    if not isinstance(raw, dict):
+        return None
+    level, message, process_name = raw.get("level"), raw.get("message"), raw.get("process_name")
+    # type checks first: an unhashable level (a list from msgpack, say) would make the LEVEL_CODES lookup raise
+    if type(level) is not str or type(message) is not str or type(process_name) is not str or level not in LEVEL_CODES:
+        return None
+    row = {"level": level, "message": message, "process_name": process_name}
+    if "timestamp" in raw:
+        timestamp = raw["timestamp"]
+        if isinstance(timestamp, str):
+            try:
+                timestamp = datetime.fromisoformat(timestamp)
+            except ValueError:
+                return None
+        elif not isinstance(timestamp, datetime):
+            return None
+        row["timestamp"] = timestamp
+    else:
+        row["timestamp"] = datetime.now()
+    log_id = raw.get("id")
+    if log_id is not None:
+        if type(log_id) is not str or not ULID_PATTERN.match(log_id):
+            return None
+        row["id"] = log_id
+    return row
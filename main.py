@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from log_center.api import router
+from log_center.models import ASYNC_DATABASE
 from dotenv import load_dotenv
 import os
 
@@ -16,6 +17,11 @@ app = FastAPI(title="Log Center API")
 app.state.ADMIN_API_KEY = ADMIN_API_KEY
 app.state.DEFAULT_USER_API_KEY = DEFAULT_USER_API_KEY
 
+# with an async driver the async ingest routes are registered first so they take precedence
+if ASYNC_DATABASE:
+    from log_center.async_api import async_router
+    app.include_router(async_router)
+
 app.include_router(router)
 
 # Entry point for running with uvicorn
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta, timezone
+
+from log_center.ids import ULID_PATTERN, ULIDGenerator, is_ulid, new_ulid, ulid_timestamp
+
+
+def test_ulids_are_well_formed():
+    value = new_ulid()
+    assert len(value) == 26
+    assert ULID_PATTERN.match(value)
+    assert is_ulid(value)
+    assert not is_ulid(value.lower())
+    assert not is_ulid("8" + value[1:])  # past the 48-bit timestamp
+    assert not is_ulid(None)
+
+
+def test_ulids_sort_in_creation_order_within_a_millisecond():
+    generator = ULIDGenerator()
+    values = [generator.new() for _ in range(10000)]
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
+
+
+def test_ulids_sort_by_timestamp():
+    start = datetime(2025, 3, 1, 10, 0, 0)
+    values = [new_ulid(start + timedelta(milliseconds=i)) for i in range(0, 5000, 7)]
+    assert values == sorted(values)
+
+
+def test_ulid_timestamp_round_trip():
+    timestamp = datetime(2025, 3, 1, 10, 0, 5, 123000, tzinfo=timezone.utc)
+    assert ulid_timestamp(new_ulid(timestamp)) == timestamp
+
+
+def test_random_part_carries_into_the_timestamp():
+    generator = ULIDGenerator()
+    generator._last_ms = 2 ** 47
+    generator._last_random = 2 ** 80 - 1
+    value = generator.new()
+    assert generator._last_ms == 2 ** 47 + 1
+    assert value[10:] == "0" * 16
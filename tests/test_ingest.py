@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from log_center import api
+from log_center.ingest import IngestPipeline, IngestQueueFull
+from log_center.models import Base, LogEntry, get_db
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'logs.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def log(message, **fields):
+    return {"level": "INFO", "message": message, "process_name": "p", **fields}
+
+
+def test_failed_group_is_retried_request_by_request(session_factory):
+    pipeline = IngestPipeline(session_factory, linger=0.5)
+    first = pipeline.submit([log("a")])
+    bad = pipeline.submit([log("b"), log("c", timestamp="not a date")])
+    last = pipeline.submit([log("d"), log("e")])
+
+    assert [row["message"] for row in first.result(10)] == ["a"]
+    assert [row["message"] for row in last.result(10)] == ["d", "e"]
+    with pytest.raises(Exception):
+        bad.result(10)
+    pipeline.stop()
+
+    with session_factory() as db:
+        assert sorted(db.scalars(select(LogEntry.message))) == ["a", "d", "e"]
+    stats = pipeline.stats()
+    assert stats["batches"] == 1
+    assert stats["split_batches"] == 1
+    assert stats["rows_committed"] == 3
+    assert stats["rows_failed"] == 2
+
+
+def test_failure_of_a_lone_request_is_not_retried(session_factory):
+    pipeline = IngestPipeline(session_factory, linger=0)
+    with pytest.raises(Exception):
+        pipeline.submit([log("x", timestamp="not a date")]).result(10)
+    pipeline.stop()
+    assert pipeline.stats()["split_batches"] == 0
+    assert pipeline.stats()["rows_failed"] == 1
+
+
+@pytest.fixture
+def stalled_pipeline(session_factory):
+    # the writer thread takes the first submission and then waits, so the queue fills up behind it
+    release = threading.Event()
+    started = threading.Event()
+
+    def stalled_session():
+        started.set()
+        release.wait(10)
+        return session_factory()
+
+    pipeline = IngestPipeline(stalled_session, linger=0, queue_size=1)
+    pipeline.submit([log("first")])
+    assert started.wait(10)
+    pipeline.submit([log("queued")])
+    yield pipeline
+    release.set()
+    pipeline.stop()
+
+
+def test_full_queue_rejects_submissions(stalled_pipeline):
+    with pytest.raises(IngestQueueFull):
+        stalled_pipeline.submit([log("rejected")])
+    assert stalled_pipeline.stats()["rejected_requests"] == 1
+
+
+def test_full_queue_answers_429_with_retry_after(stalled_pipeline, monkeypatch):
+    monkeypatch.setattr(api, "GROUP_COMMIT", True)
+    monkeypatch.setattr(api, "ingest_pipeline", stalled_pipeline)
+    app = FastAPI()
+    app.include_router(api.router)
+    app.dependency_overrides[api.verify_api_key] = lambda: "key"
+    app.dependency_overrides[get_db] = lambda: None
+    client = TestClient(app)
+
+    response = client.post("/logs/", json=log("rejected"))
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == api.INGEST_RETRY_AFTER
+
+    response = client.post("/logs/batch", json=[log("rejected")])
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == api.INGEST_RETRY_AFTER
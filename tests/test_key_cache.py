@@ -0,0 +1,80 @@
+import multiprocessing
+
+import pytest
+
+from log_center.key_cache import GENERATION_WIDTH, APIKeyCache
+
+
+def test_hits_misses_and_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("log_center.key_cache.time.monotonic", lambda: now[0])
+    cache = APIKeyCache(max_size=2, ttl=60, negative_ttl=5)
+    assert cache.get("a") is None
+    cache.set("a", True)
+    cache.set("b", False)
+    assert cache.get("a") is True
+    assert cache.get("b") is False
+
+    now[0] += 10
+    assert cache.get("a") is True
+    assert cache.get("b") is None  # negative entries expire sooner
+
+    cache.set("c", True)
+    cache.set("d", True)
+    assert cache.get("a") is None  # least recently used, evicted
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidation_reaches_other_workers(tmp_path):
+    path = str(tmp_path / "invalidation")
+    worker, other = APIKeyCache(invalidation_file=path), APIKeyCache(invalidation_file=path)
+    other.set("key", True)
+    other.set("unrelated", True)
+    assert other.get("key") is True
+
+    worker.invalidate(["key"])
+    assert other.get("unrelated") is None
+    other.set("key", True)
+    assert other.get("key") is True  # the same generation is not seen twice
+
+
+def test_invalidations_in_the_same_clock_tick_are_all_seen(tmp_path, monkeypatch):
+    # the file's mtime would not change between these, the generation does
+    monkeypatch.setattr("log_center.key_cache.time.time_ns", lambda: 0)
+    path = str(tmp_path / "invalidation")
+    worker, other = APIKeyCache(invalidation_file=path), APIKeyCache(invalidation_file=path)
+    for generation in range(1, 4):
+        other.set("key", True)
+        worker.invalidate(["key"])
+        assert other.get("key") is None
+        with open(path) as file:
+            assert file.read() == str(generation).zfill(GENERATION_WIDTH)
+
+
+def _invalidate(path, count):
+    cache = APIKeyCache(invalidation_file=path)
+    for _ in range(count):
+        cache.invalidate(["key"])
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_concurrent_invalidations_are_all_counted(tmp_path):
+    path = str(tmp_path / "invalidation")
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_invalidate, args=(path, 100)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    with open(path) as file:
+        assert int(file.read()) == 400
+
+
+def test_unreadable_generation_file(tmp_path):
+    path = tmp_path / "invalidation"
+    path.write_text("written by an older version")
+    cache = APIKeyCache(invalidation_file=str(path))
+    cache.set("key", True)
+    assert cache.get("key") is True
+    cache.invalidate(["key"])
+    assert path.read_text() == "1".zfill(GENERATION_WIDTH)
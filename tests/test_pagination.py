@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from log_center.ids import new_ulid
+from log_center.ingest import insert_log_rows
+from log_center.models import Base, LogEntry
+from log_center.pagination import decode_cursor, encode_cursor, paginate
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2025, 3, 1, 10, 0, 5, 123456)
+    log_id = new_ulid()
+    cursor = encode_cursor(timestamp, log_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (timestamp, log_id)
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "WyJ4Il0", encode_cursor(datetime(2025, 1, 1), "x")[:-4]])
+def test_invalid_cursors(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'logs.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        insert_log_rows(session, [
+            {"level": "INFO", "message": f"m{i}", "process_name": "p", "timestamp": datetime(2025, 3, 1, 10, i // 2)}
+            for i in range(7)
+        ])
+        yield session
+    engine.dispose()
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_paginate_visits_every_row_once(db, descending):
+    seen = []
+    cursor = None
+    while True:
+        rows, cursor = paginate(db.query(LogEntry), 3, cursor, descending)
+        seen += [row.message for row in rows]
+        if cursor is None:
+            break
+    expected = [f"m{i}" for i in range(7)]
+    assert sorted(seen) == expected
+    timestamps = [db.query(LogEntry).filter(LogEntry.message == message).one().timestamp for message in seen]
+    assert timestamps == sorted(timestamps, reverse=descending)
+
+
+def test_paginate_with_nothing_to_return(db):
+    assert paginate(db.query(LogEntry), 0) == ([], None)
+    assert paginate(db.query(LogEntry).filter(LogEntry.message == "none"), 3) == ([], None)
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from log_center.ingest import insert_log_rows
+from log_center.models import Base, LogEntry
+from log_center.retention import RetentionPolicy, RetentionScheduler
+
+AGES = [1, 5, 10, 40, 100, 400]
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'logs.db'}")
+    Base.metadata.create_all(engine)
+    now = datetime.now()
+    with Session(engine) as db:
+        insert_log_rows(db, [
+            {"level": level, "message": f"{process_name} {level} {age}", "process_name": process_name,
+             "timestamp": now - timedelta(days=age)}
+            for process_name in ("web", "billing", "search")
+            for level in ("DEBUG", "INFO", "ERROR")
+            for age in AGES
+        ])
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def remaining_ages(session_factory) -> dict:
+    ages = {}
+    now = datetime.now()
+    with session_factory() as db:
+        for process_name, level, timestamp in db.execute(select(LogEntry.process_name, LogEntry.level, LogEntry.timestamp)):
+            ages.setdefault((process_name, level), []).append(round((now - timestamp) / timedelta(days=1)))
+    return {key: sorted(value) for key, value in ages.items()}
+
+
+@pytest.mark.parametrize("spec, days", [
+    # the README example: process and level, then process, then level, then *
+    ("DEBUG=3,ERROR=90,*=30,billing/*=365,billing/DEBUG=7", {
+        ("web", "DEBUG"): 3, ("web", "INFO"): 30, ("web", "ERROR"): 90,
+        ("billing", "DEBUG"): 7, ("billing", "INFO"): 365, ("billing", "ERROR"): 365,
+        ("search", "DEBUG"): 3, ("search", "INFO"): 30, ("search", "ERROR"): 90,
+    }),
+    # a process with only a level rule of its own still falls through to the level and * rules
+    ("billing/DEBUG=7,ERROR=90,*=30", {
+        ("web", "DEBUG"): 30, ("web", "INFO"): 30, ("web", "ERROR"): 90,
+        ("billing", "DEBUG"): 7, ("billing", "INFO"): 30, ("billing", "ERROR"): 90,
+        ("search", "DEBUG"): 30, ("search", "INFO"): 30, ("search", "ERROR"): 90,
+    }),
+    ("billing/ERROR=365,search/*=3,ERROR=90", {
+        ("web", "DEBUG"): None, ("web", "INFO"): None, ("web", "ERROR"): 90,
+        ("billing", "DEBUG"): None, ("billing", "INFO"): None, ("billing", "ERROR"): 365,
+        ("search", "DEBUG"): 3, ("search", "INFO"): 3, ("search", "ERROR"): 3,
+    }),
+])
+def test_most_specific_rule_wins(session_factory, spec, days):
+    scheduler = RetentionScheduler(session_factory, RetentionPolicy.parse(spec), batch_size=4, pause=0)
+    scheduler.purge()
+    expected = {key: [age for age in AGES if limit is None or age < limit] for key, limit in days.items()}
+    assert remaining_ages(session_factory) == {key: ages for key, ages in expected.items() if ages}
+
+
+def test_parse_rejects_malformed_rules():
+    with pytest.raises(ValueError):
+        RetentionPolicy.parse("DEBUG")
+    with pytest.raises(ValueError):
+        RetentionPolicy.parse("billing/TRACE=3")
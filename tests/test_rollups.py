@@ -0,0 +1,109 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from log_center.ingest import insert_log_rows
+from log_center.models import Base, LogRollup
+from log_center.rollups import RollupBuffer, bucket_start, rebuild_rollups, stats_query
+
+START = datetime(2025, 3, 1, 22, 30)
+
+
+def log_rows():
+    # 2 days of logs, 7 minutes apart, spread over processes and levels
+    return [
+        {"level": ("INFO", "ERROR", "DEBUG")[i % 3], "message": f"m{i}", "process_name": f"p{i % 4}",
+         "timestamp": START + timedelta(minutes=7 * i, seconds=i % 60)}
+        for i in range(2 * 24 * 60 // 7)
+    ]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'logs.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def raw_counts(rows, bucket=None, group_by=(), start=None, end=None, level=None):
+    counts = Counter()
+    for row in rows:
+        if (start and row["timestamp"] < start) or (end and row["timestamp"] >= end) or (level and row["level"] != level):
+            continue
+        key = (bucket_start(row["timestamp"], bucket),) if bucket else ()
+        counts[key + tuple(row[name] for name in group_by)] += 1
+    return dict(counts)
+
+
+def rollup_counts(db, bucket=None, group_by=(), start=None, end=None, level=None):
+    result = db.execute(stats_query(bucket, list(group_by), start, end, level=level))
+    return {tuple(row[:-1]): row[-1] for row in result if row[-1]}
+
+
+@pytest.mark.parametrize("bucket, group_by, start, end, level", [
+    (None, (), None, None, None),
+    ("minute", ("process_name",), None, None, None),
+    ("hour", ("level",), START + timedelta(hours=1, minutes=30), START + timedelta(hours=19, minutes=30), None),
+    ("day", ("process_name", "level"), None, None, "ERROR"),
+    # aligned to whole days, so the totals come from the day rollups
+    (None, ("process_name",), datetime(2025, 3, 2), datetime(2025, 3, 3), None),
+    (None, ("level",), START + timedelta(minutes=17), START + timedelta(hours=30, minutes=3), None),
+])
+def test_stats_match_raw_counts(engine, bucket, group_by, start, end, level):
+    rows = log_rows()
+    with Session(engine) as db:
+        insert_log_rows(db, rows)
+        # retried rows keep the ids assigned on the first insert and are not counted again
+        insert_log_rows(db, [dict(row) for row in rows[:50]])
+        assert rollup_counts(db, bucket, group_by, start, end, level) == raw_counts(rows, bucket, group_by, start, end, level)
+
+
+def test_buffered_counts_reach_the_rollups_on_flush(engine):
+    rows = log_rows()
+    buffer = RollupBuffer(sessionmaker(bind=engine), interval=3600)
+    with Session(engine) as db:
+        insert_log_rows(db, rows, buffer)
+        assert db.scalars(select(LogRollup)).all() == []
+        assert buffer.stats()["pending"] > 0
+
+        buffer.stop()
+        assert buffer.stats()["pending"] == 0
+        assert buffer.stats()["flushes"] == 1
+        assert rollup_counts(db, "hour", ("level",)) == raw_counts(rows, "hour", ("level",))
+
+        # a retry of committed rows adds nothing
+        insert_log_rows(db, rows[:10], buffer)
+        assert buffer.flush() == 0
+        buffer.stop()
+
+
+def test_failed_flush_keeps_counts(engine, tmp_path):
+    rows = log_rows()[:20]
+    empty = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    buffer = RollupBuffer(sessionmaker(bind=empty), interval=3600)
+    buffer.add(rows)
+    with pytest.raises(Exception):
+        buffer.flush()
+    pending = buffer.stats()["pending"]
+    assert pending > 0
+
+    buffer.session_factory = sessionmaker(bind=engine)
+    assert buffer.flush() == pending
+    with Session(engine) as db:
+        assert rollup_counts(db, None, ("process_name",)) == raw_counts(rows, None, ("process_name",))
+    buffer.stop()
+    empty.dispose()
+
+
+def test_rebuild_matches_incremental_rollups(engine):
+    rows = log_rows()
+    with Session(engine) as db:
+        insert_log_rows(db, rows)
+        incremental = rollup_counts(db, "minute", ("process_name", "level"))
+    rebuild_rollups(engine)
+    with Session(engine) as db:
+        assert rollup_counts(db, "minute", ("process_name", "level")) == incremental
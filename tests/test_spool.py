@@ -0,0 +1,136 @@
+import os
+
+import pytest
+
+from log_center.log_client import LogWriter
+from log_center.spool import LogSpool, SpoolLocked, SpoolPosition, claim_spool, encode_record
+
+
+def records(start, count):
+    return [{"message": f"m{i}"} for i in range(start, start + count)]
+
+
+def messages(rows):
+    return [row["message"] for row in rows]
+
+
+def test_append_rotates_segments(tmp_path):
+    spool = LogSpool(str(tmp_path), max_segment_bytes=len(encode_record(records(0, 1)[0])) * 3)
+    for i in range(7):
+        spool.append(records(i, 1))
+    assert spool._segments() == [0, 1, 2]
+
+    rows, position = spool.read_batch()
+    assert messages(rows) == [f"m{i}" for i in range(7)]
+    assert position.segment == 2
+    spool.close()
+
+
+def test_commit_removes_replayed_segments(tmp_path):
+    spool = LogSpool(str(tmp_path), max_segment_bytes=1)
+    for i in range(3):
+        spool.append(records(i, 1))
+
+    rows, position = spool.read_batch(max_records=2)
+    assert messages(rows) == ["m0", "m1"]
+    spool.commit(position)
+    assert spool.checkpoint() == position
+    assert spool._segments() == [1, 2]
+
+    rows, _ = spool.read_batch()
+    assert messages(rows) == ["m2"]
+    spool.close()
+
+
+def test_reopened_spool_resumes_from_checkpoint(tmp_path):
+    spool = LogSpool(str(tmp_path))
+    spool.append(records(0, 5))
+    rows, position = spool.read_batch(max_records=3)
+    spool.commit(position)
+    spool.close()
+
+    spool = LogSpool(str(tmp_path))
+    rows, position = spool.read_batch()
+    assert messages(rows) == ["m3", "m4"]
+    spool.commit(position)
+    assert spool.pending_bytes() == 0
+    # new records go to a fresh segment after the recovered one
+    spool.append(records(5, 1))
+    assert messages(spool.read_batch()[0]) == ["m5"]
+    spool.close()
+
+
+def test_torn_record_at_end_of_closed_segment_is_skipped(tmp_path):
+    spool = LogSpool(str(tmp_path))
+    spool.append(records(0, 2))
+    spool.close()
+    # a crash in the middle of an append leaves a partial record behind
+    with open(spool._segment_path(0), "ab") as file:
+        file.write(encode_record({"message": "torn"})[:-3])
+
+    spool = LogSpool(str(tmp_path))
+    spool.append(records(2, 1))
+    rows, position = spool.read_batch()
+    assert messages(rows) == ["m0", "m1"]
+    spool.commit(position)
+    rows, position = spool.read_batch()
+    assert messages(rows) == ["m2"]
+    assert position == SpoolPosition(1, len(encode_record(records(2, 1)[0])))
+    spool.close()
+
+
+def test_read_batch_respects_max_bytes_but_reads_large_records_whole(tmp_path):
+    spool = LogSpool(str(tmp_path))
+    spool.append([{"message": "x" * 100}, {"message": "y"}])
+    rows, position = spool.read_batch(max_bytes=10)
+    assert messages(rows) == ["x" * 100]
+    spool.commit(position)
+    assert messages(spool.read_batch()[0]) == ["y"]
+    spool.close()
+
+
+def test_second_spool_on_a_locked_directory_is_refused(tmp_path):
+    spool = LogSpool(str(tmp_path))
+    with pytest.raises(SpoolLocked):
+        LogSpool(str(tmp_path))
+    spool.close()
+    # closing releases the lock
+    LogSpool(str(tmp_path)).close()
+
+
+def test_claim_spool_gives_each_writer_its_own_directory(tmp_path):
+    first = claim_spool(str(tmp_path))
+    second = claim_spool(str(tmp_path))
+    assert first.directory == str(tmp_path)
+    assert second.directory == os.path.join(str(tmp_path), "writer-1")
+
+    first.append(records(0, 1))
+    second.append(records(1, 1))
+    assert messages(first.read_batch()[0]) == ["m0"]
+    assert messages(second.read_batch()[0]) == ["m1"]
+    first.close()
+    second.close()
+
+    spools = [claim_spool(str(tmp_path), max_writers=2) for _ in range(2)]
+    with pytest.raises(SpoolLocked):
+        claim_spool(str(tmp_path), max_writers=2)
+    for spool in spools:
+        spool.close()
+
+
+def test_writer_creates_its_spool_only_when_it_has_to_spool(tmp_path):
+    directory = str(tmp_path / "spool")
+    writer = LogWriter("http://127.0.0.1:9", "key", log_file=str(tmp_path / "failed_logs.txt"), spool_dir=directory)
+    assert not os.path.exists(directory)
+    assert writer._replayer is None
+
+    assert writer._spool_records(records(0, 1))
+    assert os.path.isdir(directory)
+    assert writer.stats()["spooled_records"] == 1
+    writer.close()
+
+    # a new writer finds the pending records and claims the same directory
+    writer = LogWriter("http://127.0.0.1:9", "key", log_file=str(tmp_path / "failed_logs.txt"), spool_dir=directory)
+    assert writer.spool.directory == directory
+    assert writer.stats()["spool_pending_bytes"] > 0
+    writer.close()
@@ -0,0 +1,96 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from log_center import wire
+from log_center.api import _batch_rows
+from log_center.ids import new_ulid
+
+ROWS = [
+    {"id": new_ulid(), "level": "ERROR", "message": "disk full ✗", "process_name": "billing",
+     "timestamp": datetime(2025, 3, 1, 10, 0, 5, 123456)},
+    {"level": "DEBUG", "message": "", "process_name": "web"},
+]
+
+
+@pytest.mark.parametrize("content_type", [wire.JSON, wire.MSGPACK, wire.RECORDS])
+@pytest.mark.parametrize("encoding", [wire.IDENTITY, wire.GZIP, wire.ZSTD])
+def test_round_trip(content_type, encoding):
+    body = wire.compress(wire.encode(ROWS, content_type), encoding)
+    decoded = wire.decode_batch(body, content_type, encoding, 1024 * 1024)
+    rows = [wire.decoded_log_row(raw) for raw in decoded]
+
+    assert [row["message"] for row in rows] == ["disk full ✗", ""]
+    assert [row["level"] for row in rows] == ["ERROR", "DEBUG"]
+    assert rows[0]["id"] == ROWS[0]["id"]
+    assert rows[0]["timestamp"] == ROWS[0]["timestamp"]
+    assert "id" not in rows[1]
+
+
+def test_records_refuse_what_they_cannot_carry():
+    with pytest.raises(ValueError):
+        wire.encode_records([{**ROWS[0], "level": "TRACE"}])
+    with pytest.raises(ValueError):
+        wire.encode_records([{**ROWS[0], "timestamp": datetime(2025, 3, 1, tzinfo=timezone.utc)}])
+    with pytest.raises(ValueError):
+        wire.encode_records([{"level": "INFO", "message": "no process"}])
+
+
+@pytest.mark.parametrize("body, content_type", [
+    (b"{}", wire.JSON),
+    (b"LCR0", wire.RECORDS),
+    (wire.encode_records(ROWS)[:-1], wire.RECORDS),
+    (b"\xc1", wire.MSGPACK),
+    (b"\x81\xa1a\x01", wire.MSGPACK),
+])
+def test_malformed_bodies(body, content_type):
+    with pytest.raises(ValueError):
+        wire.decode(body, content_type)
+
+
+def test_unsupported_format_and_encoding():
+    with pytest.raises(wire.UnsupportedWireFormat):
+        wire.decode(b"[]", "text/csv")
+    with pytest.raises(wire.UnsupportedWireFormat):
+        wire.decompress(b"[]", "br", 1024)
+
+
+def test_truncated_gzip():
+    with pytest.raises(ValueError):
+        wire.decompress(wire.compress(b"[]" * 100, wire.GZIP)[:-10], wire.GZIP, 1024)
+
+
+@pytest.mark.parametrize("encoding", [wire.GZIP, wire.ZSTD])
+def test_decompression_stops_at_max_bytes(encoding):
+    body = wire.compress(b"0" * 10000, encoding)
+    with pytest.raises(wire.PayloadTooLarge):
+        wire.decompress(body, encoding, 1000)
+
+
+@pytest.mark.parametrize("raw", [
+    "not a record",
+    {"level": ["INFO"], "message": "m", "process_name": "p"},
+    {"level": {"INFO": 1}, "message": "m", "process_name": "p"},
+    {"level": "INFO", "message": "m", "process_name": ["p"]},
+    {"level": "TRACE", "message": "m", "process_name": "p"},
+    {"level": "INFO", "message": 1, "process_name": "p"},
+    {"level": "INFO", "message": "m", "process_name": "p", "timestamp": "yesterday"},
+    {"level": "INFO", "message": "m", "process_name": "p", "id": "not-a-ulid"},
+])
+def test_decoded_log_row_leaves_odd_records_to_validation(raw):
+    assert wire.decoded_log_row(raw) is None
+
+
+def test_unhashable_level_rejects_only_its_record():
+    good = {"level": "INFO", "message": "m", "process_name": "p"}
+    rows, errors = _batch_rows([{"level": ["INFO"], "message": "m", "process_name": "p"}, good, {**good, "level": {}}])
+    assert [row["message"] for row in rows] == ["m"]
+    assert [error.index for error in errors] == [0, 2]
+    assert errors[0].error.startswith("level:")
+
+
+def test_rejection_text_names_the_field_only_when_there_is_one():
+    rows, errors = _batch_rows(["not a record", {"level": "INFO", "message": "m"}])
+    assert rows == []
+    assert errors[0].error == "Input should be a valid dictionary or instance of LogEntryCreate"
+    assert errors[1].error == "process_name: Field required"